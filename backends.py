@@ -0,0 +1,172 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from coleta import (MAX_CONCORRENCIA_PADRAO, REQUISICOES_POR_SEGUNDO_PADRAO, TIMEOUT_PADRAO, LimitadorTaxa,
+                    baixar_pagina)
+from extracao import extrair_dados
+
+CAMINHO_PREFERENCIAS_PADRAO = os.path.join(
+    os.path.expanduser('~'), '.cache', 'projecao_dividendos', 'backends.json'
+)
+
+_pool_padrao = None
+_lock_pool = threading.Lock()
+
+
+def obter_pool_padrao():
+    """Pool de navegadores compartilhado do processo, criado sob demanda"""
+    global _pool_padrao
+    with _lock_pool:
+        if _pool_padrao is None:
+            # Import tardio: selenium só é carregado se algum navegador for necessário
+            from navegador import PoolNavegadores
+            _pool_padrao = PoolNavegadores()
+        return _pool_padrao
+
+
+class BackendHTTP:
+    """Coleta por HTTP simples (requests), com cache em disco e limite de taxa"""
+
+    nome = 'http'
+
+    def __init__(self, sessao=None, cache=None, requisicoes_por_segundo=REQUISICOES_POR_SEGUNDO_PADRAO,
+                 timeout=TIMEOUT_PADRAO, forcar_atualizacao=False):
+        self.sessao = sessao
+        self.cache = cache
+        self.limitador = LimitadorTaxa(requisicoes_por_segundo)
+        self.timeout = timeout
+        self.forcar_atualizacao = forcar_atualizacao
+
+    def baixar(self, acao):
+        return baixar_pagina(
+            acao, self.limitador, self.timeout, self.cache, self.forcar_atualizacao, self.sessao
+        )
+
+
+class BackendNavegador:
+    """Coleta por Firefox headless; o pool só é criado na primeira página que precisar dele"""
+
+    nome = 'navegador'
+
+    def __init__(self, cache=None, forcar_atualizacao=False, obter_pool=obter_pool_padrao):
+        self.cache = cache
+        self.forcar_atualizacao = forcar_atualizacao
+        self._obter_pool = obter_pool
+
+    def baixar(self, acao):
+        if self.cache is not None and not self.forcar_atualizacao:
+            # Só reaproveita páginas renderizadas pelo próprio navegador
+            entrada = self.cache.obter(acao, self.nome)
+            if self.cache.esta_fresca(entrada):
+                return {'acao': acao, 'status': 200, 'html': entrada['html'], 'erro': None, 'origem': 'cache',
+                        'bytes': 0}
+
+        try:
+            html = self._obter_pool().obter_html(acao)
+        except Exception as e:
+            return {'acao': acao, 'status': None, 'html': None, 'erro': str(e), 'origem': 'navegador',
+                    'bytes': 0}
+
+        if self.cache is not None:
+            self.cache.salvar(acao, html, backend=self.nome)
+        return {'acao': acao, 'status': 200, 'html': html, 'erro': None, 'origem': 'navegador',
+                'bytes': len(html.encode('utf-8'))}
+
+
+class PreferenciasBackend:
+    """Lembra, por ação, qual backend conseguiu extrair dados (persistido em JSON)"""
+
+    def __init__(self, caminho=CAMINHO_PREFERENCIAS_PADRAO):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        try:
+            with open(caminho, encoding='utf-8') as f:
+                self._preferencias = json.load(f)
+        except (OSError, ValueError):
+            self._preferencias = {}
+
+    def obter(self, acao):
+        with self._lock:
+            return self._preferencias.get(acao.lower())
+
+    def registrar(self, acao, backend):
+        with self._lock:
+            if self._preferencias.get(acao.lower()) == backend:
+                return
+            self._preferencias[acao.lower()] = backend
+            self._gravar()
+
+    def _gravar(self):
+        diretorio = os.path.dirname(self.caminho) or '.'
+        os.makedirs(diretorio, exist_ok=True)
+        fd, temporario = tempfile.mkstemp(dir=diretorio, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self._preferencias, f)
+        os.replace(temporario, self.caminho)
+
+
+def pagina_tem_dados(pagina):
+    """Critério de sucesso de um backend: HTTP 200 e alguma extração bem-sucedida.
+
+    O resultado de extrair_dados fica na página, em ``extracao``, para a
+    extração do histórico reaproveitá-lo em vez de refazer o parse.
+    """
+    if pagina['erro'] or pagina['status'] != 200 or not pagina['html']:
+        return False
+    pagina['extracao'] = extrair_dados(pagina['html'])
+    return pagina['extracao'][1] is not None
+
+
+class ColetorComFallback:
+    """Tenta os backends em ordem de custo e escala só as ações que falharem.
+
+    O backend que funcionou para uma ação é lembrado em ``preferencias`` e
+    tentado primeiro nas próximas execuções. Cada página devolvida ganha o
+    campo ``backend`` com o nome de quem a obteve.
+    """
+
+    def __init__(self, backends, preferencias=None, valida=pagina_tem_dados):
+        self.backends = list(backends)
+        self.preferencias = preferencias
+        self.valida = valida
+
+    def _ordem(self, acao):
+        preferido = self.preferencias.obter(acao) if self.preferencias is not None else None
+        return sorted(self.backends, key=lambda backend: backend.nome != preferido)
+
+    def baixar(self, acao):
+        inicio = time.perf_counter()
+        pagina = None
+        for backend in self._ordem(acao):
+            pagina = backend.baixar(acao)
+            pagina['backend'] = backend.nome
+            if self.valida(pagina):
+                if self.preferencias is not None:
+                    self.preferencias.registrar(acao, backend.nome)
+                break
+        # Tempo somado de todos os backends tentados
+        pagina['segundos'] = time.perf_counter() - inicio
+        return pagina
+
+    def baixar_paginas(self, acoes, max_concorrencia=MAX_CONCORRENCIA_PADRAO):
+        """Baixa as páginas em paralelo, entregando cada uma assim que termina"""
+        with ThreadPoolExecutor(max_workers=max(1, int(max_concorrencia))) as executor:
+            futuros = [executor.submit(self.baixar, acao) for acao in acoes]
+            for futuro in as_completed(futuros):
+                yield futuro.result()
+
+
+def criar_coletor_padrao(sessao=None, cache=None, requisicoes_por_segundo=REQUISICOES_POR_SEGUNDO_PADRAO,
+                         forcar_atualizacao=False, preferencias=None):
+    """HTTP primeiro; o navegador só é iniciado para as ações em que ele falhar"""
+    return ColetorComFallback(
+        [
+            BackendHTTP(sessao, cache, requisicoes_por_segundo, forcar_atualizacao=forcar_atualizacao),
+            BackendNavegador(cache, forcar_atualizacao=forcar_atualizacao)
+        ],
+        preferencias=preferencias if preferencias is not None else PreferenciasBackend()
+    )
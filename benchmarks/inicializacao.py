@@ -0,0 +1,109 @@
+"""Benchmark do custo de importação (partida a frio) dos módulos do projeto.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.inicializacao
+    python -m benchmarks.inicializacao --repeticoes 10 --json atual.json --comparar anterior.json
+
+Cada medição roda em um interpretador novo, para que nada venha do cache de
+``sys.modules``; vale a mediana das repetições. Além do tempo, lista quais
+dependências pesadas cada importação acabou carregando.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODULOS_PADRAO = ('coleta', 'extracao', 'instrumentacao', 'historico_store', 'cache_paginas', 'backends',
+                  'navegador', 'graficos', 'projecao', 'processamento', 'projecao_cli', 'streamlit')
+DEPENDENCIAS_PESADAS = ('pandas', 'numpy', 'requests', 'bs4', 'plotly', 'selenium', 'webdriver_manager',
+                        'psutil', 'streamlit')
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_SCRIPT_IMPORTACAO = """
+import json, sys, time
+inicio = time.perf_counter()
+import {modulo}
+segundos = time.perf_counter() - inicio
+print(json.dumps({{'segundos': segundos, 'carregados': [d for d in {dependencias!r} if d in sys.modules]}}))
+"""
+
+
+def medir_importacao(modulo, repeticoes=5):
+    """Mediana do tempo de ``import modulo`` em interpretadores novos"""
+    script = _SCRIPT_IMPORTACAO.format(modulo=modulo, dependencias=DEPENDENCIAS_PESADAS)
+    tempos, carregados = [], []
+    for _ in range(max(1, repeticoes)):
+        saida = subprocess.run([sys.executable, '-c', script], cwd=RAIZ, capture_output=True, text=True)
+        if saida.returncode != 0:
+            return {'nome': modulo, 'segundos': None, 'carregados': [],
+                    'erro': saida.stderr.strip().splitlines()[-1] if saida.stderr.strip() else 'falhou'}
+        medicao = json.loads(saida.stdout.strip().splitlines()[-1])
+        tempos.append(medicao['segundos'])
+        carregados = medicao['carregados']
+    return {'nome': modulo, 'segundos': statistics.median(tempos), 'carregados': carregados, 'erro': None}
+
+
+def medir_comando(nome, argumentos, repeticoes=5):
+    """Mediana do tempo de parede de um comando, incluindo a partida do interpretador"""
+    tempos = []
+    for _ in range(max(1, repeticoes)):
+        inicio = time.perf_counter()
+        saida = subprocess.run([sys.executable, *argumentos], cwd=RAIZ, capture_output=True, text=True)
+        tempos.append(time.perf_counter() - inicio)
+        if saida.returncode != 0:
+            return {'nome': nome, 'segundos': None, 'carregados': [], 'erro': f'código {saida.returncode}'}
+    return {'nome': nome, 'segundos': statistics.median(tempos), 'carregados': [], 'erro': None}
+
+
+def imprimir(medicoes, anteriores=None):
+    anteriores = {m['nome']: m for m in anteriores or []}
+    largura = max(len(m['nome']) for m in medicoes)
+    cabecalho = f"{'módulo':<{largura}} {'tempo':>10} {'vs.':>7}  dependências pesadas"
+    print(cabecalho)
+    print('-' * len(cabecalho))
+    for medicao in medicoes:
+        if medicao['erro']:
+            print(f"{medicao['nome']:<{largura}} {'erro':>10} {'':>7}  {medicao['erro']}")
+            continue
+        anterior = anteriores.get(medicao['nome'], {}).get('segundos')
+        razao = f"{medicao['segundos'] / anterior:>6.2f}x" if anterior else f"{'-':>7}"
+        print(f"{medicao['nome']:<{largura}} {medicao['segundos'] * 1000:>7.1f} ms {razao}  "
+              f"{', '.join(medicao['carregados']) or '-'}")
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Benchmark do tempo de importação dos módulos")
+    parser.add_argument('--modulos', nargs='+', default=list(MODULOS_PADRAO), help="módulos a importar")
+    parser.add_argument('--repeticoes', type=int, default=5, help="interpretadores por módulo; vale a mediana")
+    parser.add_argument('--sem-cli', action='store_true', help="não medir 'projecao_cli.py --help'")
+    parser.add_argument('--json', help="gravar as medições neste arquivo")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior para comparação")
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+
+    anteriores = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anteriores = json.load(f)['medicoes']
+
+    medicoes = [medir_importacao(modulo, args.repeticoes) for modulo in args.modulos]
+    if not args.sem_cli:
+        medicoes.append(medir_comando('projecao_cli --help', ['projecao_cli.py', '--help'], args.repeticoes))
+
+    imprimir(medicoes, anteriores)
+
+    if args.json:
+        configuracao = {chave: valor for chave, valor in vars(args).items() if chave not in ('json', 'comparar')}
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'configuracao': configuracao, 'medicoes': medicoes}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""Benchmark do pipeline coleta → parse → normalização → projeção → gráfico.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.pipeline
+    python -m benchmarks.pipeline --tamanhos 10 100 --latencia 0.05 --taxa-erro 0.02
+    python -m benchmarks.pipeline --json atual.json --comparar anterior.json
+
+As páginas vêm do servidor local (benchmarks/servidor_local.py), então nada
+sai para a rede. O tempo de cada etapa é somado sobre todas as ações;
+``reprojecao`` (o mesmo painel projetado com outro horizonte) fica fora do total.
+"""
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+
+import pandas as pd
+
+import coleta
+from coleta import BACKOFF_PADRAO, MAX_CONCORRENCIA_PADRAO, TENTATIVAS_PADRAO, baixar_paginas, criar_sessao
+from extracao import extrair_dados
+from graficos import criar_grafico
+from processamento import extrair_em_processos, normalizar_historico
+from projecao import CONFIG_PADRAO, montar_resultados, projetar_painel
+
+from benchmarks.servidor_local import ServidorLocal
+
+ETAPAS = ('coleta', 'parse', 'normalizacao', 'projecao', 'reprojecao', 'grafico')
+TAMANHOS_PADRAO = (10, 100, 1000)
+REQUISICOES_POR_SEGUNDO_BENCHMARK = 10000.0  # servidor local: o limitador não deve dominar
+
+
+def gerar_acoes(quantidade):
+    return [f'bch{i:04d}' for i in range(quantidade)]
+
+
+def medir(quantidade, servidor, max_concorrencia=MAX_CONCORRENCIA_PADRAO,
+          requisicoes_por_segundo=REQUISICOES_POR_SEGUNDO_BENCHMARK, tentativas=TENTATIVAS_PADRAO,
+          backoff=BACKOFF_PADRAO, graficos=True, processos=None):
+    """Executa o pipeline uma vez para ``quantidade`` ações e retorna os tempos por etapa.
+
+    Com ``processos``, parse e normalização rodam no pool de processos e o
+    tempo de parede dos dois fica todo em ``parse``.
+    """
+    acoes = gerar_acoes(quantidade)
+    tempos = dict.fromkeys(ETAPAS, 0.0)
+    sessao = criar_sessao(max_conexoes=max_concorrencia, tentativas=tentativas, backoff=backoff)
+
+    url_original = coleta.URL_DIVIDENDOS
+    coleta.URL_DIVIDENDOS = servidor.url
+    try:
+        inicio = time.perf_counter()
+        paginas = list(baixar_paginas(acoes, max_concorrencia=max_concorrencia,
+                                      requisicoes_por_segundo=requisicoes_por_segundo, sessao=sessao))
+        tempos['coleta'] = time.perf_counter() - inicio
+    finally:
+        coleta.URL_DIVIDENDOS = url_original
+        sessao.close()
+
+    metodos = Counter()
+    historicos = []
+    if processos:
+        validas = [(p['acao'], p['html']) for p in paginas if not p['erro'] and p['status'] == 200]
+        if len(validas) < len(paginas):
+            metodos['falha_coleta'] = len(paginas) - len(validas)
+        paginas = []
+        inicio = time.perf_counter()
+        for acao, df, metodo, _ in extrair_em_processos(validas, processos):
+            metodos[metodo or 'sem_dados'] += 1
+            if df is not None:
+                historicos.append(df.assign(acao=acao))
+        tempos['parse'] = time.perf_counter() - inicio
+
+    for pagina in paginas:
+        if pagina['erro'] or pagina['status'] != 200:
+            metodos['falha_coleta'] += 1
+            continue
+
+        inicio = time.perf_counter()
+        itens, metodo = extrair_dados(pagina['html'])
+        tempos['parse'] += time.perf_counter() - inicio
+        metodos[metodo or 'sem_dados'] += 1
+
+        inicio = time.perf_counter()
+        df, _ = normalizar_historico(pagina['acao'], itens, pagina['html'])
+        if df is not None:
+            historicos.append(df.assign(acao=pagina['acao']))
+        tempos['normalizacao'] += time.perf_counter() - inicio
+
+    resultados = []
+    if historicos:
+        inicio = time.perf_counter()
+        painel = pd.concat(historicos, ignore_index=True)
+        tempos['normalizacao'] += time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        resultados = montar_resultados(*projetar_painel(painel))
+        tempos['projecao'] = time.perf_counter() - inicio
+
+        # Outro horizonte sobre o mesmo painel: sem coleta nem parse
+        inicio = time.perf_counter()
+        config = CONFIG_PADRAO.com(horizonte=CONFIG_PADRAO.horizonte * 2)
+        montar_resultados(*projetar_painel(painel, config), config=config)
+        tempos['reprojecao'] = time.perf_counter() - inicio
+
+    if graficos:
+        inicio = time.perf_counter()
+        for resultado in resultados:
+            criar_grafico(resultado)
+        tempos['grafico'] = time.perf_counter() - inicio
+
+    total = sum(segundos for etapa, segundos in tempos.items() if etapa != 'reprojecao')
+    return {
+        'acoes': quantidade,
+        'projetadas': len(resultados),
+        'metodos': dict(metodos),
+        'etapas': tempos,
+        'total': total,
+        'acoes_por_segundo': quantidade / total if total else float('inf'),
+    }
+
+
+def imprimir(medicoes, anteriores=None):
+    anteriores = {m['acoes']: m for m in anteriores or []}
+    cabecalho = f"{'ações':>6} " + ' '.join(f'{etapa:>13}' for etapa in ETAPAS) + f" {'total':>9} {'ações/s':>9}"
+    print(cabecalho)
+    print('-' * len(cabecalho))
+    for medicao in medicoes:
+        colunas = ' '.join(f"{medicao['etapas'][etapa] * 1000:>10.1f} ms" for etapa in ETAPAS)
+        print(f"{medicao['acoes']:>6} {colunas} {medicao['total']:>7.2f} s {medicao['acoes_por_segundo']:>9.1f}")
+
+        anterior = anteriores.get(medicao['acoes'])
+        if anterior:
+            razoes = []
+            for etapa in ETAPAS:
+                antes = anterior['etapas'].get(etapa, 0)
+                razoes.append(f"{medicao['etapas'][etapa] / antes:>12.2f}x" if antes else f"{'-':>13}")
+            razao_total = medicao['total'] / anterior['total'] if anterior['total'] else float('nan')
+            print(f"{'vs.':>6} {' '.join(razoes)} {razao_total:>8.2f}x")
+
+    for medicao in medicoes:
+        metodos = ', '.join(f'{metodo}={n}' for metodo, n in sorted(medicao['metodos'].items()))
+        print(f"{medicao['acoes']:>6} ações: {medicao['projetadas']} projetadas ({metodos})")
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline de projeção de dividendos")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=list(TAMANHOS_PADRAO),
+                        help="quantidades de ações a medir")
+    parser.add_argument('--repeticoes', type=int, default=1,
+                        help="execuções por tamanho; vale a de menor tempo total")
+    parser.add_argument('--concorrencia', type=int, default=MAX_CONCORRENCIA_PADRAO)
+    parser.add_argument('--rps', type=float, default=REQUISICOES_POR_SEGUNDO_BENCHMARK,
+                        help="limite de requisições por segundo")
+    parser.add_argument('--tentativas', type=int, default=TENTATIVAS_PADRAO)
+    parser.add_argument('--backoff', type=float, default=BACKOFF_PADRAO)
+    parser.add_argument('--latencia', type=float, default=0.0, help="latência injetada por requisição (s)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="latência aleatória adicional (s)")
+    parser.add_argument('--taxa-erro', type=float, default=0.0, help="fração de respostas HTTP 503")
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--processos', type=int, default=0,
+                        help="extrair em um pool com este número de processos (0 na thread principal)")
+    parser.add_argument('--sem-grafico', action='store_true', help="não medir a etapa de gráficos")
+    parser.add_argument('--json', help="gravar as medições neste arquivo")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior para comparação")
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+
+    anteriores = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anteriores = json.load(f)['medicoes']
+
+    medicoes = []
+    with ServidorLocal(args.latencia, args.jitter, args.taxa_erro, semente=args.semente) as servidor:
+        for tamanho in args.tamanhos:
+            execucoes = [
+                medir(tamanho, servidor, args.concorrencia, args.rps, args.tentativas, args.backoff,
+                      graficos=not args.sem_grafico, processos=args.processos)
+                for _ in range(max(1, args.repeticoes))
+            ]
+            medicoes.append(min(execucoes, key=lambda m: m['total']))
+
+    imprimir(medicoes, anteriores)
+
+    if args.json:
+        configuracao = {chave: valor for chave, valor in vars(args).items() if chave not in ('json', 'comparar')}
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'configuracao': configuracao, 'medicoes': medicoes}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
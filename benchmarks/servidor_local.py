@@ -0,0 +1,127 @@
+"""Servidor HTTP local que imita as páginas de dividendos, para medir sem rede.
+
+Uso:
+    python -m benchmarks.servidor_local --porta 8765 --latencia 0.05 --taxa-erro 0.02
+
+Cada ação recebe sempre o mesmo layout (card, tabela genérica ou só texto),
+escolhido pelo código, a partir das páginas salvas em ``benchmarks/paginas``.
+"""
+import argparse
+import http.server
+import os
+import random
+import threading
+import time
+import zlib
+
+LAYOUTS = ('card', 'tabela', 'texto')
+DIRETORIO_PAGINAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'paginas')
+
+
+def carregar_paginas(diretorio=DIRETORIO_PAGINAS, layouts=LAYOUTS):
+    """Lê as páginas salvas, uma por layout, como bytes prontos para envio"""
+    paginas = {}
+    for layout in layouts:
+        with open(os.path.join(diretorio, layout + '.html'), 'rb') as f:
+            paginas[layout] = f.read()
+    return paginas
+
+
+class _Manipulador(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, como o servidor real
+
+    def do_GET(self):
+        servidor = self.server.servidor_local
+        acao = self.path.rstrip('/').rsplit('/', 1)[-1]
+        status, corpo = servidor.responder(acao)
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class ServidorLocal:
+    """Substituto local do site, com latência e erros injetados.
+
+    ``latencia`` (+ até ``jitter``) segundos são aguardados por requisição e
+    uma fração ``taxa_erro`` delas recebe HTTP 503. Ações cujo código começa
+    com ``erro`` sempre recebem HTTP 500. Pode ser usado como context manager.
+    """
+
+    def __init__(self, latencia=0.0, jitter=0.0, taxa_erro=0.0, layouts=LAYOUTS, porta=0, semente=None):
+        self.latencia = latencia
+        self.jitter = jitter
+        self.taxa_erro = taxa_erro
+        self.layouts = tuple(layouts)
+        self.paginas = carregar_paginas(layouts=self.layouts)
+        self.requisicoes = 0
+        self.erros = 0
+        self._aleatorio = random.Random(semente)
+        self._lock = threading.Lock()
+        self._http = http.server.ThreadingHTTPServer(('127.0.0.1', porta), _Manipulador)
+        self._http.daemon_threads = True
+        self._http.servidor_local = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """Modelo de URL no formato de coleta.URL_DIVIDENDOS"""
+        return f'http://127.0.0.1:{self._http.server_port}/dividendos/' + '{acao}'
+
+    def layout_da_acao(self, acao):
+        return self.layouts[zlib.crc32(acao.lower().encode('utf-8')) % len(self.layouts)]
+
+    def responder(self, acao):
+        with self._lock:
+            self.requisicoes += 1
+            espera = self.latencia + self._aleatorio.uniform(0, self.jitter)
+            falhar = acao.lower().startswith('erro') or self._aleatorio.random() < self.taxa_erro
+            if falhar:
+                self.erros += 1
+        if espera > 0:
+            time.sleep(espera)
+        if acao.lower().startswith('erro'):
+            return 500, b'erro interno'
+        if falhar:
+            return 503, b'servico indisponivel'
+        return 200, self.paginas[self.layout_da_acao(acao)]
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._http.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def encerrar(self):
+        self._http.shutdown()
+        self._http.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.encerrar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local de páginas de dividendos")
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--latencia', type=float, default=0.0, help="segundos por requisição")
+    parser.add_argument('--jitter', type=float, default=0.0, help="segundos aleatórios somados à latência")
+    parser.add_argument('--taxa-erro', type=float, default=0.0, help="fração de respostas HTTP 503")
+    args = parser.parse_args(argv)
+
+    with ServidorLocal(args.latencia, args.jitter, args.taxa_erro, porta=args.porta) as servidor:
+        print(f"Servindo em {servidor.url} (Ctrl+C para sair)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+import copy
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+DIRETORIO_PADRAO = os.path.join(os.path.expanduser('~'), '.cache', 'projecao_dividendos', 'paginas')
+TTL_PADRAO = 24 * 60 * 60  # segundos
+TAMANHO_MAXIMO_PADRAO = 256 * 1024 * 1024  # bytes
+
+
+class _IndiceLru:
+    """Tamanho de cada entrada, da menos para a mais usada recentemente, e o total"""
+
+    def __init__(self):
+        self.entradas = OrderedDict()  # base do caminho -> bytes
+        self.total = 0
+        self.versao_diretorio = None  # mtime do diretório depois da última escrita por este índice
+
+
+class CachePaginas:
+    """Cache em disco das páginas de dividendos, uma entrada por ação.
+
+    Cada entrada é um par ``<acao>.html`` + ``<acao>.json`` (metadados com
+    ETag/Last-Modified e o instante do download). O mtime do ``.html`` marca o
+    último acesso e define a ordem de despejo LRU quando o diretório passa de
+    ``tamanho_maximo`` bytes. Páginas de outro backend que não o HTTP (como as
+    renderizadas pelo navegador) ficam em ``<acao>.<backend>.html``: a de um
+    backend nunca é servida nem sobrescrita pelo outro.
+
+    Tamanhos e ordem de uso ficam em um índice em memória, montado com uma
+    varredura do diretório: gravar uma página não lista o diretório inteiro.
+    O índice só é refeito quando o mtime do diretório mostra que outro
+    processo gravou ou removeu entradas. Para outro TTL sobre o mesmo
+    diretório, use com_ttl, que compartilha índice e lock em vez de criar
+    um segundo índice.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_PADRAO, ttl=TTL_PADRAO, tamanho_maximo=TAMANHO_MAXIMO_PADRAO):
+        self.diretorio = diretorio
+        self.ttl = ttl
+        self.tamanho_maximo = tamanho_maximo
+        self._lock = threading.Lock()
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._indice = _IndiceLru()
+        self._indexar()
+
+    def com_ttl(self, ttl):
+        """A mesma cache (diretório, índice e lock compartilhados) com outro TTL"""
+        visao = copy.copy(self)
+        visao.ttl = ttl
+        return visao
+
+    def _versao_diretorio(self):
+        try:
+            return os.stat(self.diretorio).st_mtime_ns
+        except OSError:
+            return None
+
+    def _indexar(self):
+        # A versão é lida antes da varredura: o que mudar durante ela força outra na próxima gravação
+        self._indice.versao_diretorio = self._versao_diretorio()
+        self._indice.entradas.clear()
+        self._indice.total = 0
+        entradas = []
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith('.html'):
+                continue
+            base = os.path.join(self.diretorio, nome[:-len('.html')])
+            try:
+                info = os.stat(base + '.html')
+            except OSError:
+                continue
+            entradas.append((info.st_mtime, base, info.st_size + self._tamanho(base + '.json')))
+        for _, base, tamanho in sorted(entradas):
+            self._indice.entradas[base] = tamanho
+            self._indice.total += tamanho
+
+    @staticmethod
+    def _tamanho(caminho):
+        try:
+            return os.path.getsize(caminho)
+        except OSError:
+            return 0
+
+    def _caminhos(self, acao, backend=None):
+        nome = re.sub(r'[^a-z0-9_-]', '_', acao.lower())
+        if backend is not None:
+            nome += '.' + re.sub(r'[^a-z0-9_-]', '_', backend.lower())
+        base = os.path.join(self.diretorio, nome)
+        return base + '.html', base + '.json'
+
+    def obter(self, acao, backend=None):
+        """Retorna a entrada da ação salva por ``backend`` (None para o HTTP), com html e metadados, ou None"""
+        caminho_html, caminho_meta = self._caminhos(acao, backend)
+        try:
+            with open(caminho_meta, encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(caminho_html, encoding='utf-8') as f:
+                html = f.read()
+            os.utime(caminho_html)  # Registrar acesso para o LRU
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            base = caminho_html[:-len('.html')]
+            if base in self._indice.entradas:
+                self._indice.entradas.move_to_end(base)
+        meta['html'] = html
+        return meta
+
+    def esta_fresca(self, entrada):
+        """Indica se a entrada ainda está dentro do TTL"""
+        return entrada is not None and time.time() - entrada.get('salvo_em', 0) < self.ttl
+
+    def salvar(self, acao, html, etag=None, last_modified=None, backend=None):
+        """Grava (ou substitui) a página da ação obtida por ``backend`` e aplica o limite de tamanho"""
+        caminho_html, caminho_meta = self._caminhos(acao, backend)
+        meta = {'acao': acao, 'etag': etag, 'last_modified': last_modified, 'salvo_em': time.time()}
+        if backend is not None:
+            meta['backend'] = backend
+        with self._lock:
+            self._sincronizar()
+            self._gravar(caminho_html, html)
+            self._gravar(caminho_meta, json.dumps(meta))
+            self._atualizar(caminho_html[:-len('.html')])
+            self._despejar()
+            self._indice.versao_diretorio = self._versao_diretorio()
+
+    def renovar(self, acao, backend=None):
+        """Reinicia o TTL de uma entrada revalidada pelo servidor (HTTP 304)"""
+        _, caminho_meta = self._caminhos(acao, backend)
+        with self._lock:
+            try:
+                with open(caminho_meta, encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                return
+            meta['salvo_em'] = time.time()
+            self._sincronizar()
+            self._gravar(caminho_meta, json.dumps(meta))
+            base = caminho_meta[:-len('.json')]
+            if base in self._indice.entradas:
+                self._atualizar(base)
+            self._indice.versao_diretorio = self._versao_diretorio()
+
+    def limpar(self):
+        """Remove todas as entradas do cache"""
+        with self._lock:
+            for nome in os.listdir(self.diretorio):
+                if nome.endswith(('.html', '.json')):
+                    try:
+                        os.remove(os.path.join(self.diretorio, nome))
+                    except OSError:
+                        pass
+            self._indexar()
+
+    def _gravar(self, caminho, conteudo):
+        # Escrita atômica: outro processo nunca lê um arquivo pela metade
+        fd, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(conteudo)
+        os.replace(temporario, caminho)
+
+    def _sincronizar(self):
+        # Refaz o índice se outro processo gravou ou removeu entradas desde a nossa última escrita
+        if self._versao_diretorio() != self._indice.versao_diretorio:
+            self._indexar()
+
+    def _atualizar(self, base):
+        # Tamanho atual da entrada, que passa a ser a mais usada recentemente
+        tamanho = self._tamanho(base + '.html') + self._tamanho(base + '.json')
+        self._indice.total += tamanho - self._indice.entradas.pop(base, 0)
+        self._indice.entradas[base] = tamanho
+
+    def _despejar(self):
+        # Remover as menos usadas recentemente até caber no limite
+        while self._indice.total > self.tamanho_maximo and self._indice.entradas:
+            base, tamanho = self._indice.entradas.popitem(last=False)
+            for caminho in (base + '.html', base + '.json'):
+                try:
+                    os.remove(caminho)
+                except OSError:
+                    pass
+            self._indice.total -= tamanho
@@ -0,0 +1,196 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+URL_DIVIDENDOS = 'https://playinvest.com.br/dividendos/{acao}'
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Limites padrão da coleta
+MAX_CONCORRENCIA_PADRAO = 8
+MAX_CONCORRENCIA_MAXIMA = 32
+REQUISICOES_POR_SEGUNDO_PADRAO = 4.0
+TIMEOUT_CONEXAO_PADRAO = 5
+TIMEOUT_LEITURA_PADRAO = 15
+TIMEOUT_PADRAO = (TIMEOUT_CONEXAO_PADRAO, TIMEOUT_LEITURA_PADRAO)
+
+# Política de novas tentativas (apenas GET/HEAD, que são idempotentes)
+TENTATIVAS_PADRAO = 3
+BACKOFF_PADRAO = 0.5  # segundos; dobra a cada tentativa
+JITTER_PADRAO = 0.3  # segundos aleatórios somados a cada espera
+STATUS_REPETIR = (429, 500, 502, 503, 504)
+
+_sessao_padrao = None
+_lock_sessao = threading.Lock()
+
+
+def validar_codigo_acao(codigo):
+    """Valida se o código da ação está no formato correto (ex: PETR4, VALE3, BBAS3)"""
+    padrao = r'^[A-Za-z]{4}\d{1,2}$'
+    return bool(re.match(padrao, codigo))
+
+
+class LimitadorTaxa:
+    """Token bucket por host, compartilhado entre as threads da coleta"""
+
+    def __init__(self, requisicoes_por_segundo=REQUISICOES_POR_SEGUNDO_PADRAO, rajada=None):
+        if requisicoes_por_segundo <= 0:
+            raise ValueError("requisicoes_por_segundo deve ser positivo")
+        self.taxa = float(requisicoes_por_segundo)
+        self.capacidade = float(rajada) if rajada else max(1.0, self.taxa)
+        self._baldes = {}
+        self._lock = threading.Lock()
+
+    def aguardar(self, url):
+        """Bloqueia até haver uma ficha disponível para o host da URL"""
+        host = urlparse(url).netloc
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                fichas, ultimo = self._baldes.get(host, (self.capacidade, agora))
+                fichas = min(self.capacidade, fichas + (agora - ultimo) * self.taxa)
+                if fichas >= 1:
+                    self._baldes[host] = (fichas - 1, agora)
+                    return
+                self._baldes[host] = (fichas, agora)
+                espera = (1 - fichas) / self.taxa
+            time.sleep(espera)
+
+
+def criar_sessao(max_conexoes=MAX_CONCORRENCIA_PADRAO, tentativas=TENTATIVAS_PADRAO,
+                 backoff=BACKOFF_PADRAO, jitter=JITTER_PADRAO):
+    """Cria uma sessão HTTP com pool de conexões keep-alive e retry com backoff exponencial"""
+    # Import tardio: quem só lê do cache ou do histórico salvo não paga o import do requests
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util import Retry, make_headers
+
+    opcoes = dict(
+        total=tentativas,
+        connect=tentativas,
+        read=tentativas,
+        status=tentativas,
+        backoff_factor=backoff,
+        status_forcelist=STATUS_REPETIR,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    try:
+        retry = Retry(backoff_jitter=jitter, **opcoes)
+    except TypeError:
+        # urllib3 < 2 não tem backoff_jitter: fica só o backoff exponencial
+        retry = Retry(**opcoes)
+    adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, int(max_conexoes)), max_retries=retry)
+
+    sessao = requests.Session()
+    sessao.mount('https://', adaptador)
+    sessao.mount('http://', adaptador)
+    sessao.headers.update(HEADERS)
+    # gzip/deflate sempre; br quando o pacote brotli estiver instalado
+    sessao.headers.update(make_headers(accept_encoding=True))
+    return sessao
+
+
+def obter_sessao_padrao():
+    """Sessão compartilhada do processo, criada sob demanda"""
+    global _sessao_padrao
+    with _lock_sessao:
+        if _sessao_padrao is None:
+            _sessao_padrao = criar_sessao(max_conexoes=MAX_CONCORRENCIA_MAXIMA)
+        return _sessao_padrao
+
+
+def baixar_pagina(acao, limitador=None, timeout=TIMEOUT_PADRAO, cache=None, forcar_atualizacao=False,
+                  sessao=None):
+    """Baixa a página de dividendos de uma ação sem levantar exceções.
+
+    Com ``cache``, uma entrada dentro do TTL é devolvida sem tocar a rede; uma
+    entrada vencida é revalidada com If-None-Match/If-Modified-Since. Erros
+    transitórios (timeout, 5xx, 429) são repetidos pela própria ``sessao``. O campo
+    ``origem`` indica de onde veio o HTML: 'cache', 'revalidado' ou 'rede'. Para
+    diagnóstico, ``segundos`` traz o tempo total, ``espera`` o tempo parado no
+    limitador de taxa e ``bytes`` o tamanho do corpo recebido.
+    """
+    inicio = time.perf_counter()
+    pagina = _baixar_pagina(acao, limitador, timeout, cache, forcar_atualizacao, sessao)
+    pagina['segundos'] = time.perf_counter() - inicio
+    return pagina
+
+
+def _baixar_pagina(acao, limitador, timeout, cache, forcar_atualizacao, sessao):
+    entrada = None
+    if cache is not None and not forcar_atualizacao:
+        entrada = cache.obter(acao)
+        if entrada is not None and entrada.get('backend') is not None:
+            # Página de outro backend gravada antes da separação por backend: não vale como resposta HTTP
+            entrada = None
+        if cache.esta_fresca(entrada):
+            return {'acao': acao, 'status': 200, 'html': entrada['html'], 'erro': None, 'origem': 'cache',
+                    'espera': 0.0, 'bytes': 0}
+
+    headers = {}
+    if entrada is not None:
+        if entrada.get('etag'):
+            headers['If-None-Match'] = entrada['etag']
+        if entrada.get('last_modified'):
+            headers['If-Modified-Since'] = entrada['last_modified']
+
+    url = URL_DIVIDENDOS.format(acao=acao)
+    espera = 0.0
+    if limitador is not None:
+        inicio_espera = time.perf_counter()
+        limitador.aguardar(url)
+        espera = time.perf_counter() - inicio_espera
+
+    if sessao is None:
+        sessao = obter_sessao_padrao()
+
+    try:
+        response = sessao.get(url, headers=headers, timeout=timeout)
+        response.encoding = 'utf-8'  # Forçar encoding UTF-8
+    except Exception as e:
+        return {'acao': acao, 'status': None, 'html': None, 'erro': str(e), 'origem': 'rede',
+                'espera': espera, 'bytes': 0}
+
+    if response.status_code == 304 and entrada is not None:
+        cache.renovar(acao)
+        return {'acao': acao, 'status': 200, 'html': entrada['html'], 'erro': None, 'origem': 'revalidado',
+                'espera': espera, 'bytes': len(response.content)}
+
+    if response.status_code == 200 and cache is not None:
+        cache.salvar(
+            acao, response.text,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified')
+        )
+
+    return {
+        'acao': acao,
+        'status': response.status_code,
+        'html': response.text if response.status_code == 200 else None,
+        'erro': None,
+        'origem': 'rede',
+        'espera': espera,
+        'bytes': len(response.content)
+    }
+
+
+def baixar_paginas(acoes, max_concorrencia=MAX_CONCORRENCIA_PADRAO,
+                   requisicoes_por_segundo=REQUISICOES_POR_SEGUNDO_PADRAO, timeout=TIMEOUT_PADRAO,
+                   cache=None, forcar_atualizacao=False, sessao=None):
+    """Baixa as páginas em paralelo, entregando cada uma assim que termina"""
+    limitador = LimitadorTaxa(requisicoes_por_segundo)
+    if sessao is None:
+        sessao = obter_sessao_padrao()
+    with ThreadPoolExecutor(max_workers=max(1, int(max_concorrencia))) as executor:
+        futuros = [
+            executor.submit(baixar_pagina, acao, limitador, timeout, cache, forcar_atualizacao, sessao)
+            for acao in acoes
+        ]
+        for futuro in as_completed(futuros):
+            yield futuro.result()
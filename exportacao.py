@@ -0,0 +1,227 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+import zipfile
+
+import numpy as np
+
+from instrumentacao import ETAPA_EXPORTACAO, NULA
+from projecao import projetar_painel, simular_painel
+
+FORMATOS = ('parquet', 'csv', 'xlsx')
+TABELAS = ('resumo', 'historicos', 'projecoes')
+EXTENSOES = {'parquet': '.parquet.zip', 'csv': '.csv.zip', 'xlsx': '.xlsx'}
+TIPOS_MIME = {
+    'parquet': 'application/zip',
+    'csv': 'application/zip',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+# Dependência opcional de cada formato; o CSV só precisa do pandas
+DEPENDENCIAS = {'parquet': 'pyarrow', 'xlsx': 'openpyxl'}
+
+ACOES_POR_LOTE = 500  # ações convertidas e gravadas por vez
+LINHAS_POR_PLANILHA = 1_048_576  # limite do Excel, cabeçalho incluído
+
+
+def formatos_disponiveis():
+    """Formatos cujas dependências estão instaladas"""
+    return tuple(formato for formato in FORMATOS
+                 if formato not in DEPENDENCIAS or importlib.util.find_spec(DEPENDENCIAS[formato]) is not None)
+
+
+def formato_do_caminho(caminho):
+    """Formato pela extensão: .xlsx, .parquet.zip ou .csv.zip"""
+    nome = str(caminho).lower()
+    for formato, extensao in EXTENSOES.items():
+        if nome.endswith(extensao):
+            return formato
+    raise ValueError(f"Extensão de exportação não reconhecida: {caminho} "
+                     f"(use {', '.join(EXTENSOES.values())})")
+
+
+def tabelas_lote(calculo, resumo, projecoes, faixas=None):
+    """Tabelas numéricas de um lote projetado, como ``{nome: DataFrame}`` na ordem de TABELAS.
+
+    ``resumo`` tem uma linha por ação, ``historicos`` uma por ação e ano do
+    cálculo e ``projecoes`` uma por ação e ano projetado, com os cenários e,
+    com ``faixas``, os percentis simulados.
+    """
+    tabela_resumo = resumo.rename_axis('acao').reset_index()
+    tabela_resumo['acao'] = tabela_resumo['acao'].str.upper()
+    # Tipo fixo: um lote sem nenhuma regra não pode virar coluna nula no Parquet
+    tabela_resumo['descricao_tratamento'] = tabela_resumo['descricao_tratamento'].astype('string')
+
+    historicos = calculo[['acao', 'Ano', 'Proventos', 'Variação']].reset_index(drop=True)
+    historicos['acao'] = historicos['acao'].str.upper()
+
+    tabela_projecoes = projecoes.reset_index(drop=True)
+    tabela_projecoes['acao'] = tabela_projecoes['acao'].str.upper()
+    if faixas is not None:
+        # simular_painel gera as linhas na mesma ordem (ação, ano) de projetar_painel
+        for coluna in [coluna for coluna in faixas.columns if coluna.startswith('P')]:
+            tabela_projecoes[coluna] = faixas[coluna].to_numpy()
+
+    return {'resumo': tabela_resumo, 'historicos': historicos, 'projecoes': tabela_projecoes}
+
+
+def lotes_projetados(calculo, resumo, projecoes, faixas=None, acoes_por_lote=ACOES_POR_LOTE):
+    """Divide a saída de projetar_painel (e de simular_painel) em lotes de tabelas de ``acoes_por_lote`` ações"""
+    if resumo is None or not len(resumo):
+        return
+    # Linhas de cada ação contíguas e na ordem de resumo, como em montar_resultados
+    tamanhos = calculo.groupby('acao', sort=False).size().reindex(resumo.index).to_numpy()
+    limites = np.concatenate(([0], np.cumsum(tamanhos)))
+    por_acao = len(projecoes) // len(resumo)
+    for ini in range(0, len(resumo), acoes_por_lote):
+        fim = min(ini + acoes_por_lote, len(resumo))
+        anos = slice(ini * por_acao, fim * por_acao)
+        yield tabelas_lote(calculo.iloc[limites[ini]:limites[fim]], resumo.iloc[ini:fim], projecoes.iloc[anos],
+                           None if faixas is None else faixas.iloc[anos])
+
+
+def lotes_do_painel(painel, config=None, simulacoes=0, semente=None, acoes_por_lote=ACOES_POR_LOTE):
+    """Projeta um painel (acao, Ano, Proventos) lote a lote, gerando as tabelas de cada lote.
+
+    Cada lote só é projetado quando o escritor pede o próximo: além do painel,
+    nunca há mais de um lote de tabelas em memória. Com ``simulacoes``, todos
+    os lotes sorteiam do mesmo gerador, semeado por ``semente``.
+    """
+    codigos, acoes = painel['acao'].factorize()
+    gerador = np.random.default_rng(semente)
+    for ini in range(0, len(acoes), acoes_por_lote):
+        parte = painel[(codigos >= ini) & (codigos < ini + acoes_por_lote)]
+        calculo, resumo, projecoes = projetar_painel(parte, config)
+        faixas = simular_painel(calculo, resumo, config, simulacoes, gerador) if simulacoes else None
+        yield from lotes_projetados(calculo, resumo, projecoes, faixas, acoes_por_lote)
+
+
+class _EscritorCsv:
+    """Um CSV por tabela em arquivos temporários, reunidos em um ZIP no fim"""
+
+    def __init__(self):
+        self._arquivos = {}
+
+    def escrever(self, nome, tabela):
+        arquivo = self._arquivos.get(nome)
+        cabecalho = arquivo is None
+        if cabecalho:
+            arquivo = self._arquivos[nome] = tempfile.TemporaryFile()
+        tabela.to_csv(arquivo, index=False, header=cabecalho, encoding='utf-8')
+
+    def fechar(self, destino):
+        with zipfile.ZipFile(destino, 'w', zipfile.ZIP_DEFLATED) as pacote:
+            for nome, arquivo in self._arquivos.items():
+                arquivo.seek(0)
+                with arquivo, pacote.open(f'{nome}.csv', 'w', force_zip64=True) as membro:
+                    shutil.copyfileobj(arquivo, membro)
+
+
+class _EscritorParquet:
+    """Um Parquet por tabela, um row group por lote, reunidos em um ZIP no fim"""
+
+    def __init__(self):
+        self._escritores = {}
+
+    def escrever(self, nome, tabela):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if nome in self._escritores:
+            # Os lotes seguintes seguem o esquema do primeiro
+            escritor = self._escritores[nome][1]
+            escritor.write_table(pa.Table.from_pandas(tabela, schema=escritor.schema, preserve_index=False))
+            return
+        dados = pa.Table.from_pandas(tabela, preserve_index=False)
+        arquivo = tempfile.TemporaryFile()
+        escritor = pq.ParquetWriter(arquivo, dados.schema)
+        self._escritores[nome] = (arquivo, escritor)
+        escritor.write_table(dados)
+
+    def fechar(self, destino):
+        # Parquet já vem comprimido: os membros são só armazenados
+        with zipfile.ZipFile(destino, 'w', zipfile.ZIP_STORED) as pacote:
+            for nome, (arquivo, escritor) in self._escritores.items():
+                escritor.close()
+                arquivo.seek(0)
+                with arquivo, pacote.open(f'{nome}.parquet', 'w', force_zip64=True) as membro:
+                    shutil.copyfileobj(arquivo, membro)
+
+
+class _EscritorXlsx:
+    """Uma planilha por tabela, escrita linha a linha no modo write-only do openpyxl.
+
+    Tabelas maiores que o limite do Excel continuam em planilhas
+    ``historicos_2``, ``historicos_3``...
+    """
+
+    def __init__(self):
+        from openpyxl import Workbook
+
+        self._pasta = Workbook(write_only=True)
+        self._planilhas = {}  # nome -> [planilha, linhas escritas, partes, colunas]
+
+    def _nova_planilha(self, nome, colunas, parte):
+        planilha = self._pasta.create_sheet(nome if parte == 1 else f'{nome}_{parte}')
+        planilha.append(colunas)
+        self._planilhas[nome] = [planilha, 1, parte, colunas]
+
+    def escrever(self, nome, tabela):
+        colunas = [str(coluna) for coluna in tabela.columns]
+        if nome not in self._planilhas:
+            self._nova_planilha(nome, colunas, 1)
+        # NaN e <NA> viram células vazias; o resto já sai como escalares Python
+        valores = tabela.astype(object).where(tabela.notna(), None)
+        for linha in valores.itertuples(index=False, name=None):
+            estado = self._planilhas[nome]
+            if estado[1] >= LINHAS_POR_PLANILHA:
+                self._nova_planilha(nome, estado[3], estado[2] + 1)
+                estado = self._planilhas[nome]
+            estado[0].append(linha)
+            estado[1] += 1
+
+    def fechar(self, destino):
+        self._pasta.save(destino)
+
+
+_ESCRITORES = {'csv': _EscritorCsv, 'parquet': _EscritorParquet, 'xlsx': _EscritorXlsx}
+
+
+def exportar(lotes, destino, formato, instrumentacao=None):
+    """Grava os lotes de tabelas em ``destino``, um caminho ou um arquivo binário aberto para escrita.
+
+    ``lotes`` vem de lotes_projetados ou lotes_do_painel. Em 'csv' e 'parquet',
+    o destino é um ZIP com um arquivo por tabela; em 'xlsx', uma pasta de
+    trabalho com uma planilha por tabela. Cada lote é gravado em disco assim
+    que é gerado, sem montar a exportação inteira em memória. Retorna as
+    linhas gravadas por tabela.
+    """
+    if formato not in _ESCRITORES:
+        raise ValueError(f"Formato de exportação desconhecido: {formato} (use {', '.join(FORMATOS)})")
+    if formato not in formatos_disponiveis():
+        raise ImportError(f"Exportar em {formato} requer o pacote {DEPENDENCIAS[formato]}")
+    instrumentacao = instrumentacao if instrumentacao is not None else NULA
+    linhas = dict.fromkeys(TABELAS, 0)
+    with instrumentacao.medir(ETAPA_EXPORTACAO, formato=formato) as registro:
+        escritor = _ESCRITORES[formato]()
+        for tabelas in lotes:
+            for nome, tabela in tabelas.items():
+                escritor.escrever(nome, tabela)
+                linhas[nome] += len(tabela)
+        escritor.fechar(destino)
+        registro['linhas'] = sum(linhas.values())
+    return linhas
+
+
+def exportar_arquivo_temporario(lotes, formato, instrumentacao=None):
+    """Exporta para um arquivo temporário e o devolve aberto só para leitura, no início.
+
+    O arquivo não tem nome no disco e some quando é fechado; a leitura é um
+    BufferedReader, um dos tipos que o download_button do Streamlit aceita.
+    """
+    with tempfile.TemporaryFile() as arquivo:
+        exportar(lotes, arquivo, formato, instrumentacao)
+        arquivo.flush()
+        leitura = open(os.dup(arquivo.fileno()), 'rb')
+    leitura.seek(0)
+    return leitura
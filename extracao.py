@@ -0,0 +1,92 @@
+import re
+
+CLASSE_CARD = 'card featured-card per-year-chart'
+
+# Métodos de extração, do mais rápido ao mais lento
+METODO_CARD = 'card'
+METODO_TABELA = 'tabela'
+METODO_TEXTO = 'texto'
+
+MINIMO_ITENS = 4
+
+
+def _textos_celulas(elemento):
+    textos = []
+    for linha in elemento.find_all('tr'):
+        for coluna in linha.find_all(['th', 'td']):
+            texto = coluna.get_text(strip=True)
+            if texto:
+                textos.append(texto)
+    return textos
+
+
+def _fragmento_card(html):
+    """Recorta do HTML apenas o card anual (até o fim da sua tabela), sem parse completo"""
+    inicio_busca = 0
+    while True:
+        posicao = html.find('per-year-chart', inicio_busca)
+        if posicao == -1:
+            return None
+        inicio = html.rfind('<div', 0, posicao)
+        fim_tag = html.find('>', posicao)
+        if inicio != -1 and fim_tag != -1 and html.rfind('<', 0, posicao) == inicio:
+            fim = html.find('</table>', fim_tag)
+            if fim == -1:
+                return None
+            return html[inicio:fim + len('</table>')]
+        inicio_busca = posicao + 1
+
+
+def extrair_card(html):
+    """Caminho rápido: faz o parse só do card ``per-year-chart``"""
+    fragmento = _fragmento_card(html)
+    if fragmento is None:
+        return []
+    from bs4 import BeautifulSoup  # Import tardio: o histórico salvo dispensa o parse
+
+    soup = BeautifulSoup(fragmento, 'html.parser')
+    card = soup.find('div', class_=CLASSE_CARD)
+    return _textos_celulas(card) if card else []
+
+
+def extrair_dados(html):
+    """Extrai as células (ano/valor) da página de dividendos.
+
+    Tenta primeiro o card anual recortado do HTML bruto; a árvore completa
+    só é construída quando esse caminho não encontra dados, para as buscas
+    em qualquer tabela e por padrões no texto. Retorna ``(itens, metodo)``,
+    com ``metodo`` igual a METODO_CARD, METODO_TABELA, METODO_TEXTO ou None.
+    """
+    data = extrair_card(html)
+    if len(data) >= MINIMO_ITENS:
+        return data, METODO_CARD
+
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Card com marcação que o recorte não reconheceu
+    card = soup.find('div', class_=CLASSE_CARD)
+    if card:
+        data = _textos_celulas(card)
+        if len(data) >= MINIMO_ITENS:
+            return data, METODO_CARD
+
+    # Procurar por qualquer tabela
+    for tabela in soup.find_all('table'):
+        data.extend(_textos_celulas(tabela))
+        if len(data) >= MINIMO_ITENS:
+            return data, METODO_TABELA
+
+    # Buscar por padrões no texto
+    texto_completo = soup.get_text()
+    anos = re.findall(r'\b(20\d{2})\b', texto_completo)
+    valores = re.findall(r'R\$\s*[\d.,]+', texto_completo)
+
+    if len(anos) >= 2 and len(valores) >= 2:
+        data = []
+        for ano, valor in zip(anos, valores):
+            data.extend([ano, valor])
+        return data, METODO_TEXTO
+
+    return data, None
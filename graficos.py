@@ -0,0 +1,217 @@
+import math
+
+# plotly é importado dentro das funções: só quem desenha gráficos paga o import
+
+COLUNAS_MULTIPLOS_PADRAO = 4
+ALTURA_LINHA_MULTIPLOS = 220  # pixels por linha de pequenos múltiplos
+
+# (rótulo, atributo do ResultadoAcao, cor) das séries de projeção
+SERIES_CENARIOS = (
+    ('Cenário 1: Média Total', 'projecao_cenario1', '#E74C3C'),
+    ('Cenário 2: Média 5 Anos', 'projecao_cenario2', '#28B463'),
+    ('Cenário 3: Média 2 Anos', 'projecao_cenario3', '#F39C12'),
+)
+
+
+def criar_grafico(resultado):
+    import plotly.graph_objects as go
+
+    acao = resultado.acao
+    anos_historico = resultado.anos_historico.tolist()
+    proventos_historico = resultado.proventos_historico.tolist()
+    projecao_cenario1 = resultado.projecao_cenario1.tolist()
+    projecao_cenario2 = resultado.projecao_cenario2.tolist()
+    projecao_cenario3 = resultado.projecao_cenario3.tolist()
+    anos_projecao = resultado.anos_projecao.tolist()
+
+    fig = go.Figure()
+
+    # Dados históricos
+    fig.add_trace(go.Scatter(
+        x=anos_historico,
+        y=proventos_historico,
+        mode='lines+markers',
+        name='Dados Históricos',
+        line=dict(color='#2E86C1', width=3),
+        marker=dict(size=8, color='#2E86C1'),
+        hovertemplate='<b>%{x}</b><br>Dividendo: R$ %{y:.2f}<extra></extra>'
+    ))
+
+    ultimo_ano = anos_historico[-1]
+    ultimo_valor = proventos_historico[-1]
+
+    # Faixa da simulação Monte Carlo (menor e maior percentil), por baixo dos cenários
+    faixas = resultado.faixas
+    if faixas:
+        percentis = sorted(faixas, key=lambda coluna: int(coluna[1:]))
+        anos_faixa = [ultimo_ano] + anos_projecao
+        inferior, superior = percentis[0], percentis[-1]
+        fig.add_trace(go.Scatter(
+            x=anos_faixa,
+            y=[ultimo_valor] + faixas[superior].tolist(),
+            mode='lines',
+            name=f'Simulação {superior}',
+            showlegend=False,
+            line=dict(color='rgba(142,68,173,0.4)', width=1),
+            hovertemplate=f'<b>%{{x}}</b><br>{superior}: R$ %{{y:.2f}}<extra></extra>'
+        ))
+        fig.add_trace(go.Scatter(
+            x=anos_faixa,
+            y=[ultimo_valor] + faixas[inferior].tolist(),
+            mode='lines',
+            name=f'Simulação {inferior}–{superior}',
+            fill='tonexty',
+            fillcolor='rgba(142,68,173,0.15)',
+            line=dict(color='rgba(142,68,173,0.4)', width=1),
+            hovertemplate=f'<b>%{{x}}</b><br>{inferior}: R$ %{{y:.2f}}<extra></extra>'
+        ))
+        for percentil in percentis[1:-1]:
+            fig.add_trace(go.Scatter(
+                x=anos_faixa,
+                y=[ultimo_valor] + faixas[percentil].tolist(),
+                mode='lines',
+                name=f'Simulação {percentil}',
+                line=dict(color='#8E44AD', width=2, dash='dot'),
+                hovertemplate=f'<b>%{{x}}</b><br>{percentil}: R$ %{{y:.2f}}<extra></extra>'
+            ))
+
+    # Cenário 1
+    anos_c1 = [ultimo_ano] + anos_projecao
+    valores_c1 = [ultimo_valor] + projecao_cenario1
+    fig.add_trace(go.Scatter(
+        x=anos_c1,
+        y=valores_c1,
+        mode='lines+markers',
+        name='Cenário 1: Média Total',
+        line=dict(color='#E74C3C', width=2, dash='dash'),
+        marker=dict(size=6, color='#E74C3C', symbol='square'),
+        hovertemplate='<b>%{x}</b><br>Projeção: R$ %{y:.2f}<extra></extra>'
+    ))
+
+    # Cenário 2
+    anos_c2 = [ultimo_ano] + anos_projecao
+    valores_c2 = [ultimo_valor] + projecao_cenario2
+    fig.add_trace(go.Scatter(
+        x=anos_c2,
+        y=valores_c2,
+        mode='lines+markers',
+        name='Cenário 2: Média 5 Anos',
+        line=dict(color='#28B463', width=2, dash='dash'),
+        marker=dict(size=6, color='#28B463', symbol='triangle-up'),
+        hovertemplate='<b>%{x}</b><br>Projeção: R$ %{y:.2f}<extra></extra>'
+    ))
+
+    # Cenário 3
+    anos_c3 = [ultimo_ano] + anos_projecao
+    valores_c3 = [ultimo_valor] + projecao_cenario3
+    fig.add_trace(go.Scatter(
+        x=anos_c3,
+        y=valores_c3,
+        mode='lines+markers',
+        name='Cenário 3: Média 2 Anos',
+        line=dict(color='#F39C12', width=2, dash='dash'),
+        marker=dict(size=6, color='#F39C12', symbol='diamond'),
+        hovertemplate='<b>%{x}</b><br>Projeção: R$ %{y:.2f}<extra></extra>'
+    ))
+
+    # Linha divisória
+    fig.add_vline(
+        x=ultimo_ano + 0.5,
+        line_dash="dot",
+        line_color="gray",
+        opacity=0.7,
+        annotation_text="Início das Projeções",
+        annotation_position="top"
+    )
+
+    # Título
+    titulo = f'Evolução e Projeção de Dividendos - {acao.upper()}'
+    if resultado.descricao_tratamento:
+        titulo += f' ({resultado.descricao_tratamento})'
+
+    fig.update_layout(
+        title={
+            'text': titulo,
+            'x': 0.5,
+            'xanchor': 'center',
+            'font': {'size': 18, 'family': 'Arial Black'}
+        },
+        xaxis_title='Ano',
+        yaxis_title='Dividendos (R$)',
+        font=dict(size=11),
+        hovermode='x unified',
+        legend=dict(
+            orientation="v",
+            yanchor="top",
+            y=1,
+            xanchor="left",
+            x=1.02,
+            bgcolor="rgba(255,255,255,0.9)",
+            bordercolor="rgba(0,0,0,0.2)",
+            borderwidth=1,
+            font=dict(size=10)
+        ),
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        height=500,
+        margin=dict(l=60, r=150, t=80, b=60)
+    )
+
+    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.2)')
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.2)')
+
+    return fig
+
+
+def criar_grafico_multiplos(resultados, colunas=COLUNAS_MULTIPLOS_PADRAO):
+    """Pequenos múltiplos de várias ações em uma única figura WebGL (Scattergl).
+
+    Mais leve que uma figura por ação: só linhas, sem marcadores nem
+    anotações, e a legenda é compartilhada entre os painéis.
+    """
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    colunas = max(1, min(colunas, len(resultados)))
+    linhas = math.ceil(len(resultados) / colunas)
+    fig = make_subplots(
+        rows=linhas, cols=colunas,
+        subplot_titles=[resultado.acao.upper() for resultado in resultados],
+        horizontal_spacing=0.04, vertical_spacing=min(0.08, 0.3 / linhas)
+    )
+
+    for i, resultado in enumerate(resultados):
+        linha, coluna = divmod(i, colunas)
+        anos_historico = resultado.anos_historico.tolist()
+        proventos_historico = resultado.proventos_historico.tolist()
+        ultimo_ano = anos_historico[-1]
+        ultimo_valor = proventos_historico[-1]
+        primeiro = i == 0
+
+        fig.add_trace(go.Scattergl(
+            x=anos_historico, y=proventos_historico,
+            mode='lines', name='Dados Históricos', legendgroup='historico', showlegend=primeiro,
+            line=dict(color='#2E86C1', width=2),
+            hovertemplate='<b>%{x}</b><br>Dividendo: R$ %{y:.2f}<extra>' + resultado.acao.upper() + '</extra>'
+        ), row=linha + 1, col=coluna + 1)
+
+        for nome, chave, cor in SERIES_CENARIOS:
+            fig.add_trace(go.Scattergl(
+                x=[ultimo_ano] + resultado.anos_projecao.tolist(), y=[ultimo_valor] + getattr(resultado, chave).tolist(),
+                mode='lines', name=nome, legendgroup=chave, showlegend=primeiro,
+                line=dict(color=cor, width=1.5, dash='dash'),
+                hovertemplate='<b>%{x}</b><br>Projeção: R$ %{y:.2f}<extra>' + resultado.acao.upper() + '</extra>'
+            ), row=linha + 1, col=coluna + 1)
+
+    fig.update_layout(
+        height=ALTURA_LINHA_MULTIPLOS * linhas + 80,
+        font=dict(size=10),
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        legend=dict(orientation='h', yanchor='bottom', y=1.0, xanchor='left', x=0),
+        margin=dict(l=40, r=20, t=60, b=30)
+    )
+    fig.update_annotations(font_size=11)
+    fig.update_xaxes(showgrid=True, gridcolor='rgba(128,128,128,0.2)', tickfont=dict(size=9))
+    fig.update_yaxes(showgrid=True, gridcolor='rgba(128,128,128,0.2)', tickfont=dict(size=9))
+    return fig
@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+CAMINHO_PADRAO = os.path.join(os.path.expanduser('~'), '.cache', 'projecao_dividendos', 'historico.sqlite3')
+TTL_PADRAO = 24 * 60 * 60  # segundos
+TTL_ANO_CORRENTE_PADRAO = 6 * 60 * 60  # para ações com proventos no ano corrente, ainda provisórios
+RETENCAO_PADRAO = 90 * 24 * 60 * 60  # segundos sem atualização antes de uma ação sair do armazém
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS proventos (
+    acao TEXT NOT NULL,
+    ano INTEGER NOT NULL,
+    proventos REAL NOT NULL,
+    PRIMARY KEY (acao, ano)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS atualizacoes (
+    acao TEXT PRIMARY KEY,
+    atualizado_em REAL NOT NULL,
+    ano_coleta INTEGER NOT NULL
+);
+"""
+
+
+class ArmazemHistorico:
+    """Histórico normalizado (acao, Ano, Proventos) persistido em SQLite.
+
+    A chave primária ``(acao, ano)`` serve de índice por ação e faz de cada
+    gravação um merge: anos recoletados substituem os antigos e os demais
+    são mantidos. ``atualizacoes`` guarda quando cada ação foi coletada pela
+    última vez e em que ano, para a atualização incremental. Ações que já
+    têm proventos no ano corrente vencem em ``ttl_ano_corrente`` (ou em
+    ``ttl``, se for menor), porque esse ano ainda está em aberto.
+    """
+
+    def __init__(self, caminho=CAMINHO_PADRAO, ttl=TTL_PADRAO, ttl_ano_corrente=TTL_ANO_CORRENTE_PADRAO):
+        self.caminho = caminho
+        self.ttl = ttl
+        self.ttl_ano_corrente = min(ttl, ttl_ano_corrente)
+        self._lock = threading.Lock()
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        with self._conexao() as conexao:
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.executescript(_ESQUEMA)
+
+    @contextmanager
+    def _conexao(self):
+        # Uma conexão por operação: o armazém é usado a partir de várias threads
+        conexao = sqlite3.connect(self.caminho, timeout=30)
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    @staticmethod
+    def _preparar_acoes(conexao, acoes):
+        conexao.execute('CREATE TEMP TABLE IF NOT EXISTS consulta (acao TEXT PRIMARY KEY)')
+        conexao.execute('DELETE FROM consulta')
+        conexao.executemany('INSERT OR IGNORE INTO consulta VALUES (?)', [(acao.lower(),) for acao in acoes])
+
+    def salvar(self, painel, agora=None):
+        """Faz o merge de um painel (acao, Ano, Proventos) e marca as ações como atualizadas"""
+        agora = time.time() if agora is None else agora
+        ano_coleta = time.localtime(agora).tm_year
+        linhas = list(zip(
+            painel['acao'].str.lower(), painel['Ano'].astype(int).tolist(), painel['Proventos'].astype(float).tolist()
+        ))
+        acoes = sorted({acao for acao, _, _ in linhas})
+        with self._lock, self._conexao() as conexao:
+            conexao.executemany(
+                'INSERT INTO proventos (acao, ano, proventos) VALUES (?, ?, ?) '
+                'ON CONFLICT (acao, ano) DO UPDATE SET proventos = excluded.proventos',
+                linhas
+            )
+            conexao.executemany(
+                'INSERT OR REPLACE INTO atualizacoes (acao, atualizado_em, ano_coleta) VALUES (?, ?, ?)',
+                [(acao, agora, ano_coleta) for acao in acoes]
+            )
+
+    def carregar(self, acoes=None):
+        """Lê o histórico de várias ações (todas, sem ``acoes``) em uma única consulta, como painel longo"""
+        import pandas as pd
+
+        with self._lock, self._conexao() as conexao:
+            if acoes is None:
+                linhas = conexao.execute('SELECT acao, ano, proventos FROM proventos ORDER BY acao, ano').fetchall()
+            else:
+                self._preparar_acoes(conexao, acoes)
+                linhas = conexao.execute(
+                    'SELECT p.acao, p.ano, p.proventos FROM proventos p '
+                    'JOIN consulta c ON c.acao = p.acao ORDER BY p.acao, p.ano'
+                ).fetchall()
+        painel = pd.DataFrame(linhas, columns=['acao', 'Ano', 'Proventos'])
+        return painel.astype({'Ano': int, 'Proventos': float})
+
+    def desatualizadas(self, acoes, agora=None):
+        """Ações que precisam ser coletadas de novo, na ordem recebida.
+
+        Entram as que nunca foram salvas, as salvas há mais de ``ttl`` segundos,
+        as coletadas em um ano anterior ao atual, cujo último ano ainda não
+        estava fechado, e as com proventos no ano atual salvas há mais de
+        ``ttl_ano_corrente`` segundos.
+        """
+        agora = time.time() if agora is None else agora
+        ano = time.localtime(agora).tm_year
+        with self._lock, self._conexao() as conexao:
+            self._preparar_acoes(conexao, acoes)
+            # MAX(ano) por ação é uma busca na chave primária (acao, ano)
+            atualizadas = {
+                acao for (acao,) in conexao.execute(
+                    'SELECT a.acao FROM atualizacoes a JOIN consulta c ON c.acao = a.acao '
+                    'WHERE a.atualizado_em >= ? AND a.ano_coleta >= ? AND (a.atualizado_em >= ? OR '
+                    'COALESCE((SELECT MAX(p.ano) FROM proventos p WHERE p.acao = a.acao), 0) < ?)',
+                    (agora - self.ttl, ano, agora - self.ttl_ano_corrente, ano)
+                )
+            }
+        return [acao for acao in acoes if acao.lower() not in atualizadas]
+
+    def versao(self):
+        """Muda sempre que o conteúdo muda: serve de chave para índices derivados do histórico"""
+        with self._lock, self._conexao() as conexao:
+            return conexao.execute(
+                'SELECT COUNT(*), COALESCE(MAX(atualizado_em), 0) FROM atualizacoes'
+            ).fetchone()
+
+    def remover(self, acoes):
+        """Remove o histórico das ações dadas; retorna quantas estavam salvas"""
+        with self._lock, self._conexao() as conexao:
+            self._preparar_acoes(conexao, acoes)
+            conexao.execute('DELETE FROM proventos WHERE acao IN (SELECT acao FROM consulta)')
+            return conexao.execute('DELETE FROM atualizacoes WHERE acao IN (SELECT acao FROM consulta)').rowcount
+
+    def limpar(self, antes_de=None):
+        """Remove o histórico salvo; com ``antes_de`` (timestamp), só o das ações sem atualização desde então.
+
+        Retorna quantas ações foram removidas.
+        """
+        with self._lock, self._conexao() as conexao:
+            if antes_de is None:
+                conexao.execute('DELETE FROM proventos')
+                return conexao.execute('DELETE FROM atualizacoes').rowcount
+            conexao.execute(
+                'DELETE FROM proventos WHERE acao IN (SELECT acao FROM atualizacoes WHERE atualizado_em < ?)',
+                (antes_de,)
+            )
+            return conexao.execute('DELETE FROM atualizacoes WHERE atualizado_em < ?', (antes_de,)).rowcount
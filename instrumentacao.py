@@ -0,0 +1,116 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Etapas registradas pelo pipeline, na ordem em que acontecem
+ETAPA_COLETA = 'coleta'
+ETAPA_PARSE = 'parse'
+ETAPA_NORMALIZACAO = 'normalizacao'
+ETAPA_EXTRACAO = 'extracao'  # parse + normalização, ou acerto do cache de extração
+ETAPA_PROJECAO = 'projecao'
+ETAPA_GRAFICO = 'grafico'
+ETAPA_TABELA = 'tabela'
+ETAPA_EXPORTACAO = 'exportacao'
+
+ETAPAS = (ETAPA_COLETA, ETAPA_PARSE, ETAPA_NORMALIZACAO, ETAPA_EXTRACAO, ETAPA_PROJECAO, ETAPA_GRAFICO,
+          ETAPA_TABELA, ETAPA_EXPORTACAO)
+
+
+class Instrumentacao:
+    """Registro de tempos por ação e etapa do pipeline.
+
+    Cada registro é um dicionário com ``acao`` (None para etapas em lote),
+    ``etapa``, ``segundos`` e campos livres como ``bytes``, ``origem`` ou
+    ``metodo``. Pode ser usado de várias threads ao mesmo tempo.
+    """
+
+    def __init__(self):
+        self._registros = []
+        self._lock = threading.Lock()
+
+    def registrar(self, etapa, acao=None, segundos=None, **dados):
+        registro = {'acao': acao, 'etapa': etapa, 'segundos': segundos, **dados}
+        with self._lock:
+            self._registros.append(registro)
+        return registro
+
+    @contextmanager
+    def medir(self, etapa, acao=None, **dados):
+        """Mede o bloco; campos adicionados ao dicionário devolvido entram no registro"""
+        extras = dict(dados)
+        inicio = time.perf_counter()
+        try:
+            yield extras
+        finally:
+            self.registrar(etapa, acao, time.perf_counter() - inicio, **extras)
+
+    def descartar(self, *etapas):
+        """Remove os registros das etapas dadas (por exemplo, antes de medir uma nova renderização)"""
+        with self._lock:
+            self._registros = [r for r in self._registros if r['etapa'] not in etapas]
+
+    @property
+    def registros(self):
+        with self._lock:
+            return list(self._registros)
+
+    def tabela(self):
+        """Um registro por linha, com as colunas fixas primeiro"""
+        import pandas as pd
+
+        tabela = pd.DataFrame(self.registros)
+        if tabela.empty:
+            return pd.DataFrame(columns=['acao', 'etapa', 'segundos'])
+        return tabela
+
+    def resumo(self):
+        """Tempo total, médio, p95 e máximo por etapa, da mais cara para a mais barata"""
+        import pandas as pd
+
+        tabela = self.tabela().dropna(subset=['segundos'])
+        if tabela.empty:
+            return pd.DataFrame(columns=['etapa', 'registros', 'total_s', 'media_ms', 'p95_ms', 'max_ms'])
+        segundos = tabela.groupby('etapa')['segundos']
+        resumo = pd.DataFrame({
+            'registros': segundos.size(),
+            'total_s': segundos.sum(),
+            'media_ms': segundos.mean() * 1000,
+            'p95_ms': segundos.quantile(0.95) * 1000,
+            'max_ms': segundos.max() * 1000,
+        })
+        return resumo.sort_values('total_s', ascending=False).reset_index()
+
+    def por_acao(self):
+        """Uma linha por ação: segundos de cada etapa, bytes, origem da página e método de extração"""
+        import pandas as pd
+
+        tabela = self.tabela()
+        tabela = tabela[tabela['acao'].notna()]
+        if tabela.empty:
+            return pd.DataFrame(columns=['acao'])
+        tempos = tabela.pivot_table(index='acao', columns='etapa', values='segundos', aggfunc='sum', sort=False)
+        tempos = tempos.reindex(columns=[etapa for etapa in ETAPAS if etapa in tempos.columns])
+        tempos.columns = [f'{etapa}_s' for etapa in tempos.columns]
+        informacoes = [coluna for coluna in ('bytes', 'espera', 'origem', 'backend', 'status', 'metodo')
+                       if coluna in tabela.columns]
+        if informacoes:
+            primeiros = tabela.groupby('acao', sort=False)[informacoes].first()
+            tempos = tempos.join(primeiros)
+        return tempos.reset_index()
+
+    def para_json(self):
+        return json.dumps(self.registros, ensure_ascii=False, default=str, indent=2)
+
+    def para_csv(self):
+        return self.tabela().to_csv(index=False)
+
+
+class _InstrumentacaoNula(Instrumentacao):
+    """Não guarda nada: usada quando o chamador não pediu instrumentação"""
+
+    def registrar(self, etapa, acao=None, segundos=None, **dados):
+        return {}
+
+
+NULA = _InstrumentacaoNula()
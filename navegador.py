@@ -0,0 +1,570 @@
+import atexit
+import logging
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from io import StringIO
+
+from coleta import URL_DIVIDENDOS
+
+# selenium e webdriver_manager são importados dentro das funções: importar este
+# módulo (constantes, PoolNavegadores) não os carrega
+
+# Configurar logging para suprimir mensagens desnecessárias
+logging.getLogger('selenium').setLevel(logging.ERROR)
+logging.getLogger('urllib3').setLevel(logging.ERROR)
+logging.getLogger('webdriver_manager').setLevel(logging.ERROR)
+
+TAMANHO_POOL_PADRAO = 2
+PAGINAS_POR_DRIVER_PADRAO = 50
+TIMEOUT_TABELA_PADRAO = 15  # segundos de espera explícita pelo card anual
+SELETOR_TABELA = 'div.per-year-chart'
+
+# Limites do supervisor, somados sobre todos os pools e sessões do processo
+MAX_NAVEGADORES_PADRAO = 6
+MEMORIA_MAXIMA_MB_PADRAO = 3072  # geckodriver + Firefox + processos filhos
+OCIOSO_MAXIMO_PADRAO = 300  # segundos parado antes de o navegador ser fechado
+ESPERA_VAGA_PADRAO = 120  # segundos esperando vaga antes de desistir de criar um navegador
+INTERVALO_SUPERVISAO = 15  # segundos entre as verificações de ociosidade e memória
+
+# redirect_stdout troca o sys.stdout do processo inteiro: serializar
+_lock_silencio = threading.Lock()
+_caminho_driver = None
+_pools = weakref.WeakSet()
+_supervisor = None
+_lock_supervisor = threading.Lock()
+
+
+@contextmanager
+def _silenciar():
+    with _lock_silencio:
+        saida = StringIO()
+        with redirect_stdout(saida), redirect_stderr(saida):
+            yield
+
+
+def caminho_geckodriver():
+    """Instala (uma vez por processo) e retorna o caminho do geckodriver"""
+    global _caminho_driver
+    if _caminho_driver is None:
+        from webdriver_manager.firefox import GeckoDriverManager
+
+        with _silenciar():
+            _caminho_driver = GeckoDriverManager().install()
+    return _caminho_driver
+
+
+def criar_driver():
+    """Cria um novo Firefox headless com configurações otimizadas"""
+    from selenium import webdriver
+    from selenium.webdriver.firefox.options import Options
+    from selenium.webdriver.firefox.service import Service
+
+    options = Options()
+    options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--window-size=1920,1080')
+    options.add_argument('--disable-extensions')
+    options.add_argument('--disable-plugins')
+    options.add_argument('--disable-images')
+    options.add_argument('--disable-javascript')
+    options.add_argument('--disable-css')
+    options.add_argument('--disable-logging')
+    options.add_argument('--disable-background-timer-throttling')
+    options.add_argument('--disable-backgrounding-occluded-windows')
+    options.add_argument('--disable-renderer-backgrounding')
+    options.add_argument('--disable-features=TranslateUI')
+    options.add_argument('--disable-ipc-flooding-protection')
+    options.add_argument('--silent')
+
+    # Suprimir logs do Firefox
+    options.set_preference("devtools.console.stdout.content", False)
+    options.set_preference("browser.dom.window.dump.enabled", False)
+    options.set_preference("devtools.console.stdout.chrome", False)
+    # Não baixar imagens (o --disable-images acima só vale para o Chrome)
+    options.set_preference("permissions.default.image", 2)
+
+    driver_path = caminho_geckodriver()
+    with _silenciar():
+        service = Service(driver_path, log_path=os.devnull)  # Suprimir logs do service
+        driver = webdriver.Firefox(service=service, options=options)
+    driver.set_page_load_timeout(30)
+    return driver
+
+
+def encerrar_driver(driver):
+    """Fecha o driver sem levantar exceções"""
+    try:
+        with _silenciar():
+            driver.quit()
+    except Exception:
+        pass
+
+
+def driver_saudavel(driver):
+    """Verifica se o processo do geckodriver está vivo e se a sessão ainda responde"""
+    try:
+        processo = driver.service.process
+        if processo is not None and processo.poll() is not None:
+            return False
+        return driver.execute_script('return 1') == 1
+    except Exception:
+        return False
+
+
+def processos_driver(driver):
+    """Processos deste driver (geckodriver e Firefox), identificados na criação.
+
+    Com psutil, são objetos ``psutil.Process``, que reconhecem reuso de PID;
+    sem ele, só o ``Popen`` do geckodriver.
+    """
+    processo = getattr(getattr(driver, 'service', None), 'process', None)
+    try:
+        import psutil
+    except ImportError:
+        return [processo] if processo is not None else []
+
+    pids = [processo.pid] if processo is not None else []
+    try:
+        pid_firefox = driver.capabilities.get('moz:processID')
+        if pid_firefox:
+            pids.append(int(pid_firefox))
+    except Exception:
+        pass
+    processos = []
+    for pid in pids:
+        try:
+            processos.append(psutil.Process(pid))
+        except psutil.Error:
+            pass
+    return processos
+
+
+def _com_filhos(processos):
+    import psutil
+
+    vistos = {}
+    for processo in processos:
+        try:
+            for filho in [processo, *processo.children(recursive=True)]:
+                vistos[filho.pid] = filho
+        except psutil.Error:
+            pass
+    return list(vistos.values())
+
+
+def memoria_processos_mb(processos):
+    """RSS somado dos processos e de seus filhos; None sem psutil"""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    total = 0
+    for processo in _com_filhos(processos):
+        try:
+            total += processo.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / 2 ** 20
+
+
+def matar_processos(processos):
+    """Mata só os processos dados (e seus filhos) que ainda estiverem vivos"""
+    try:
+        import psutil
+    except ImportError:
+        for processo in processos:
+            if processo.poll() is None:
+                processo.kill()
+        return
+    mortos = []
+    for processo in _com_filhos(processos):
+        try:
+            if processo.is_running():
+                processo.kill()
+                mortos.append(processo)
+        except psutil.Error:
+            pass
+    psutil.wait_procs(mortos, timeout=3)  # recolhe os que são filhos deste processo
+
+
+class SupervisorNavegadores:
+    """Controle, no processo inteiro, dos navegadores de todos os pools e sessões.
+
+    Limita a quantidade total de navegadores e a memória somada dos processos
+    deles; ao faltar vaga, fecha primeiro os ociosos mais antigos e só então
+    espera, até ``espera_vaga`` segundos. Uma thread fecha os navegadores
+    ociosos há mais de ``ocioso_maximo`` segundos. Só encerra processos que
+    ele mesmo registrou ao criar cada driver, nunca por nome.
+    """
+
+    def __init__(self, max_navegadores=MAX_NAVEGADORES_PADRAO, memoria_maxima_mb=MEMORIA_MAXIMA_MB_PADRAO,
+                 ocioso_maximo=OCIOSO_MAXIMO_PADRAO, espera_vaga=ESPERA_VAGA_PADRAO,
+                 intervalo=INTERVALO_SUPERVISAO, medir_memoria=memoria_processos_mb):
+        self.max_navegadores = max(1, int(max_navegadores))
+        self.memoria_maxima_mb = memoria_maxima_mb
+        self.ocioso_maximo = ocioso_maximo
+        self.espera_vaga = espera_vaga
+        self.intervalo = intervalo
+        self._medir_memoria = medir_memoria
+        self._cond = threading.Condition()
+        self._drivers = {}  # driver -> {'pool', 'processos', 'criado', 'ultimo_uso', 'emprestado'}
+        self._reservados = 0  # criações em andamento
+        self._contadores = dict.fromkeys(
+            ('criados', 'encerrados', 'expirados', 'por_memoria', 'por_vaga', 'processos_mortos', 'esperas',
+             'recusados'), 0
+        )
+        self._parar = threading.Event()
+        self._thread = None
+
+    def _iniciar_thread(self):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._supervisionar, name='supervisor-navegadores',
+                                                daemon=True)
+                self._thread.start()
+
+    def _supervisionar(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.reciclar_ociosos()
+            except Exception:
+                logging.getLogger(__name__).exception("Falha na supervisão dos navegadores")
+
+    def memoria_mb(self):
+        """Memória somada dos navegadores registrados; None sem psutil"""
+        with self._cond:
+            processos = [processo for registro in self._drivers.values() for processo in registro['processos']]
+        return self._medir_memoria(processos)
+
+    def _acima_da_memoria(self):
+        if self.memoria_maxima_mb is None:
+            return False
+        memoria = self.memoria_mb()
+        return memoria is not None and memoria >= self.memoria_maxima_mb
+
+    def _ocioso_mais_antigo(self):
+        ociosos = [(registro['ultimo_uso'], id(driver), driver) for driver, registro in self._drivers.items()
+                   if not registro['emprestado']]
+        return min(ociosos)[2] if ociosos else None
+
+    def criar(self, pool, criar):
+        """Cria um driver para ``pool`` quando houver vaga nos limites do processo"""
+        self._iniciar_thread()
+        prazo = time.monotonic() + self.espera_vaga
+        esperou = False
+        while True:
+            with self._cond:
+                lotado = len(self._drivers) + self._reservados >= self.max_navegadores
+            sem_memoria = not lotado and self._drivers and self._acima_da_memoria()
+            if not lotado and not sem_memoria:
+                with self._cond:
+                    if len(self._drivers) + self._reservados < self.max_navegadores:
+                        self._reservados += 1
+                        break
+                continue
+
+            with self._cond:
+                candidato = self._ocioso_mais_antigo()
+            if candidato is not None and self._reciclar(candidato, 'por_vaga' if lotado else 'por_memoria'):
+                continue
+
+            restante = prazo - time.monotonic()
+            with self._cond:
+                if restante <= 0:
+                    self._contadores['recusados'] += 1
+                    raise RuntimeError(
+                        f"Sem vaga para um novo navegador após {self.espera_vaga:.0f} s "
+                        f"(limite de {self.max_navegadores} navegadores / {self.memoria_maxima_mb} MB)"
+                    )
+                if not esperou:
+                    self._contadores['esperas'] += 1
+                    esperou = True
+                self._cond.wait(min(restante, 1.0))
+
+        try:
+            driver = criar()
+        except BaseException:
+            with self._cond:
+                self._reservados -= 1
+                self._cond.notify_all()
+            raise
+        agora = time.monotonic()
+        registro = {'pool': weakref.ref(pool), 'processos': processos_driver(driver), 'criado': agora,
+                    'ultimo_uso': agora, 'emprestado': True}
+        with self._cond:
+            self._reservados -= 1
+            self._drivers[driver] = registro
+            self._contadores['criados'] += 1
+        return driver
+
+    def emprestado(self, driver):
+        with self._cond:
+            if driver in self._drivers:
+                self._drivers[driver]['emprestado'] = True
+
+    def devolvido(self, driver, manter=True):
+        """Marca o driver como ocioso; False se ele deve ser fechado (memória acima do limite)"""
+        if manter and self._acima_da_memoria():
+            with self._cond:
+                self._contadores['por_memoria'] += 1
+            manter = False
+        with self._cond:
+            if manter and driver in self._drivers:
+                self._drivers[driver]['emprestado'] = False
+                self._drivers[driver]['ultimo_uso'] = time.monotonic()
+            self._cond.notify_all()
+        return manter
+
+    def encerrar(self, driver, encerrar=encerrar_driver):
+        """Fecha o driver e mata os processos dele que sobreviverem ao quit"""
+        with self._cond:
+            registro = self._drivers.pop(driver, None)
+        encerrar(driver)
+        if registro is not None:
+            vivos = [processo for processo in registro['processos'] if _vivo(processo)]
+            if vivos:
+                matar_processos(vivos)
+        with self._cond:
+            if registro is not None:
+                self._contadores['encerrados'] += 1
+                if vivos:
+                    self._contadores['processos_mortos'] += 1
+            self._cond.notify_all()
+
+    def _reciclar(self, driver, motivo):
+        """Fecha um driver ocioso, se o pool dele ainda não o emprestou de novo"""
+        with self._cond:
+            registro = self._drivers.get(driver)
+        if registro is None or registro['emprestado']:
+            return False
+        pool = registro['pool']()
+        if pool is not None:
+            if not pool._retirar_livre(driver):
+                return False
+            pool._descartar(driver)
+        else:
+            self.encerrar(driver)
+        with self._cond:
+            self._contadores[motivo] += 1
+        return True
+
+    def reciclar_ociosos(self):
+        """Fecha os ociosos além de ``ocioso_maximo`` e, acima da memória, os mais antigos"""
+        agora = time.monotonic()
+        with self._cond:
+            expirados = [driver for driver, registro in self._drivers.items()
+                         if not registro['emprestado'] and agora - registro['ultimo_uso'] >= self.ocioso_maximo]
+        for driver in expirados:
+            self._reciclar(driver, 'expirados')
+        while self._acima_da_memoria():
+            with self._cond:
+                candidato = self._ocioso_mais_antigo()
+            if candidato is None or not self._reciclar(candidato, 'por_memoria'):
+                break
+
+    def metricas(self):
+        """Estado atual e contadores acumulados, para exibição"""
+        with self._cond:
+            emprestados = sum(1 for registro in self._drivers.values() if registro['emprestado'])
+            metricas = {
+                'navegadores': len(self._drivers),
+                'emprestados': emprestados,
+                'ociosos': len(self._drivers) - emprestados,
+                'criando': self._reservados,
+                'max_navegadores': self.max_navegadores,
+                'memoria_maxima_mb': self.memoria_maxima_mb,
+                **self._contadores,
+            }
+        memoria = self.memoria_mb()
+        metricas['memoria_mb'] = round(memoria, 1) if memoria is not None else None
+        return metricas
+
+    def encerrar_tudo(self):
+        """Fecha os ociosos de todos os pools; os emprestados são fechados na devolução"""
+        encerrar_pools()
+        with self._cond:
+            orfaos = [driver for driver, registro in self._drivers.items() if registro['pool']() is None]
+        for driver in orfaos:
+            self.encerrar(driver)
+
+    def finalizar(self):
+        """Na saída do processo: para a supervisão e mata o que ainda estiver registrado"""
+        self._parar.set()
+        self.encerrar_tudo()
+        with self._cond:
+            restantes = [processo for registro in self._drivers.values() for processo in registro['processos']]
+            self._drivers.clear()
+        matar_processos([processo for processo in restantes if _vivo(processo)])
+
+
+def _vivo(processo):
+    if hasattr(processo, 'poll'):
+        return processo.poll() is None
+    try:
+        return processo.is_running()
+    except Exception:
+        return False
+
+
+def obter_supervisor():
+    """Supervisor único do processo, criado no primeiro uso"""
+    global _supervisor
+    with _lock_supervisor:
+        if _supervisor is None:
+            _supervisor = SupervisorNavegadores()
+        return _supervisor
+
+
+def metricas_navegadores():
+    """Métricas do supervisor, ou None se nenhum navegador foi usado neste processo"""
+    return _supervisor.metricas() if _supervisor is not None else None
+
+
+def encerrar_navegadores():
+    """Fecha os navegadores do processo sem tocar em processos de outros programas ou sessões"""
+    if _supervisor is not None:
+        _supervisor.encerrar_tudo()
+    else:
+        encerrar_pools()
+
+
+class PoolNavegadores:
+    """Pool limitado de navegadores headless reaproveitados entre execuções.
+
+    Cada driver é verificado antes do uso e reciclado depois de
+    ``paginas_por_driver`` páginas, para conter o crescimento de memória do
+    Firefox. Os drivers são criados sob demanda, até ``tamanho``, e sempre
+    pelo ``supervisor`` (o do processo, por padrão), que aplica os limites
+    globais e fecha os que ficarem ociosos.
+    """
+
+    def __init__(self, tamanho=TAMANHO_POOL_PADRAO, paginas_por_driver=PAGINAS_POR_DRIVER_PADRAO,
+                 timeout_tabela=TIMEOUT_TABELA_PADRAO, criar=criar_driver, encerrar=encerrar_driver,
+                 saudavel=driver_saudavel, supervisor=None):
+        self.tamanho = max(1, int(tamanho))
+        self.paginas_por_driver = paginas_por_driver
+        self.timeout_tabela = timeout_tabela
+        self._criar = criar
+        self._encerrar = encerrar
+        self._saudavel = saudavel
+        self._supervisor = supervisor if supervisor is not None else obter_supervisor()
+        self._livres = []  # pilha: o driver usado por último é o primeiro reaproveitado
+        self._vagas = threading.Semaphore(self.tamanho)
+        self._paginas = {}
+        self._lock = threading.Lock()
+        self._encerrado = False
+        _pools.add(self)
+
+    @contextmanager
+    def driver(self):
+        """Empresta um driver saudável do pool, bloqueando enquanto todos estiverem em uso"""
+        from selenium.common.exceptions import WebDriverException
+
+        self._vagas.acquire()
+        driver = None
+        try:
+            driver = self._obter_livre()
+            yield driver
+        except WebDriverException:
+            # Sessão possivelmente corrompida: descartar em vez de devolver ao pool
+            self._descartar(driver)
+            driver = None
+            raise
+        finally:
+            if driver is not None:
+                self._devolver(driver)
+            self._vagas.release()
+
+    def _obter_livre(self):
+        while True:
+            with self._lock:
+                driver = self._livres.pop() if self._livres else None
+                if driver is not None:
+                    self._supervisor.emprestado(driver)
+            if driver is None:
+                driver = self._supervisor.criar(self, self._criar)
+                with self._lock:
+                    self._paginas[driver] = 0
+                return driver
+            if self._saudavel(driver):
+                return driver
+            self._descartar(driver)
+
+    def _devolver(self, driver):
+        with self._lock:
+            self._paginas[driver] = self._paginas.get(driver, 0) + 1
+            manter = not self._encerrado and self._paginas[driver] < self.paginas_por_driver
+            # Ocioso no supervisor e na pilha ao mesmo tempo, sob o lock do pool
+            manter = self._supervisor.devolvido(driver, manter)
+            if manter:
+                self._livres.append(driver)
+        if not manter:
+            self._descartar(driver)
+
+    def _retirar_livre(self, driver):
+        """Tira um driver ocioso da pilha (para o supervisor fechá-lo); False se já foi emprestado"""
+        with self._lock:
+            if driver not in self._livres:
+                return False
+            self._livres.remove(driver)
+            self._supervisor.emprestado(driver)
+            return True
+
+    def _descartar(self, driver):
+        if driver is None:
+            return
+        with self._lock:
+            self._paginas.pop(driver, None)
+        self._supervisor.encerrar(driver, self._encerrar)
+
+    def obter_html(self, acao):
+        """Carrega a página da ação e espera o card anual aparecer, sem pausas fixas"""
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        with self.driver() as driver:
+            driver.get(URL_DIVIDENDOS.format(acao=acao))
+            try:
+                WebDriverWait(driver, self.timeout_tabela).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, SELETOR_TABELA))
+                )
+            except TimeoutException:
+                pass  # A página sem tabela é tratada por quem faz o parse
+            return driver.page_source
+
+    def encerrar(self):
+        """Fecha todos os drivers ociosos; os emprestados são fechados na devolução"""
+        with self._lock:
+            self._encerrado = True
+            livres, self._livres = self._livres, []
+            for driver in livres:
+                self._supervisor.emprestado(driver)
+        for driver in livres:
+            self._descartar(driver)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._paginas)
+
+
+def encerrar_pools():
+    """Fecha os drivers ociosos de todos os pools do processo"""
+    for pool in list(_pools):
+        pool.encerrar()
+
+
+def _finalizar():
+    if _supervisor is not None:
+        _supervisor.finalizar()
+    else:
+        encerrar_pools()
+
+
+atexit.register(_finalizar)
@@ -0,0 +1,458 @@
+import multiprocessing
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+
+import pandas as pd
+
+from coleta import MAX_CONCORRENCIA_PADRAO, REQUISICOES_POR_SEGUNDO_PADRAO, baixar_paginas
+from extracao import extrair_dados
+from instrumentacao import (ETAPA_COLETA, ETAPA_EXTRACAO, ETAPA_NORMALIZACAO, ETAPA_PARSE, ETAPA_PROJECAO,
+                             NULA, Instrumentacao)
+from projecao import avisos_projecao, montar_resultados, projetar_painel
+
+LOTE_GRAVACAO = 200  # ações por gravação no armazém de histórico
+INTERVALO_FLUXO_PADRAO = 0.5  # segundos entre lotes parciais de processar_fluxo
+LOTE_PROCESSOS = 16  # páginas por tarefa enviada a um processo de extração
+
+
+def extrair_historico(acao, html, instrumentacao=None, extracao=None):
+    """Extrai e normaliza o histórico anual (Ano, Proventos) de uma ação.
+
+    Função pura: não acessa a rede nem o Streamlit. Retorna ``(df, metodo, avisos)``,
+    onde ``df`` é None em caso de falha, ``metodo`` é o método de extração usado e
+    ``avisos`` é uma lista de pares ``(nivel, mensagem)`` com nivel 'info',
+    'warning', 'error' ou 'debug'. Com ``instrumentacao``, registra os tempos de
+    parse e de normalização. ``extracao`` é o ``(itens, metodo)`` de extrair_dados
+    já calculado para esta página (pelo coletor, ao validá-la), que dispensa o parse.
+    """
+    instrumentacao = instrumentacao if instrumentacao is not None else NULA
+
+    # Extração: card anual primeiro, parse completo só como fallback
+    with instrumentacao.medir(ETAPA_PARSE, acao) as registro:
+        try:
+            data, metodo_extracao = extracao if extracao is not None else extrair_dados(html)
+        except Exception as e:
+            return None, None, [('error', f"❌ Erro no parse HTML para {acao.upper()}: {str(e)}")]
+        registro['metodo'] = metodo_extracao
+
+    with instrumentacao.medir(ETAPA_NORMALIZACAO, acao):
+        df, avisos = normalizar_historico(acao, data, html)
+    return df, metodo_extracao, avisos
+
+
+def normalizar_historico(acao, data, html=''):
+    """Organiza as células extraídas (ano/valor) em um DataFrame (Ano, Proventos).
+
+    ``html`` só é usado na mensagem de debug quando faltam dados. Retorna
+    ``(df, avisos)``, com ``df`` None em caso de falha.
+    """
+    avisos = []
+    try:
+        # Filtrar dados vazios
+        filtered_data = [item for item in data if item.strip() != '']
+
+        if len(filtered_data) < 4:
+            avisos.append(('warning', f"⚠️ Dados insuficientes para {acao.upper()} - encontrados {len(filtered_data)} itens"))
+            avisos.append(('debug', {
+                "Dados encontrados:": filtered_data,
+                "Primeiros 500 chars do HTML:": html[:500]
+            }))
+            return None, avisos
+
+        # Processar e organizar dados
+        try:
+            # Encontrar onde começam os dados (pular cabeçalhos)
+            start_index = 0
+            for i, item in enumerate(filtered_data):
+                if re.match(r'^\d{4}$', item):  # Encontrou um ano
+                    start_index = i
+                    break
+
+            # Se não encontrou ano, assumir que os primeiros 2 são cabeçalhos
+            if start_index == 0 and len(filtered_data) > 2:
+                if not re.match(r'^\d{4}$', filtered_data[0]):
+                    start_index = 2
+
+            # Organizar em pares (ano, valor)
+            pares = []
+            for i in range(start_index, len(filtered_data) - 1, 2):
+                if i + 1 < len(filtered_data):
+                    item1 = filtered_data[i].strip()
+                    item2 = filtered_data[i + 1].strip()
+
+                    # Verificar qual é o ano
+                    if re.match(r'^\d{4}$', item1):
+                        pares.append((item1, item2))
+                    elif re.match(r'^\d{4}$', item2):
+                        pares.append((item2, item1))
+
+            if not pares:
+                avisos.append(('warning', f"⚠️ Não foi possível organizar dados para {acao.upper()}"))
+                return None, avisos
+
+            # Criar DataFrame
+            df = pd.DataFrame(pares, columns=['Ano', 'Proventos'])
+
+            # Limpar valores monetários
+            df['Proventos'] = df['Proventos'].astype(str)
+            df['Proventos'] = df['Proventos'].str.replace('R$', '', regex=False)
+            df['Proventos'] = df['Proventos'].str.replace('.', '', regex=False)  # Remove separador de milhares
+            df['Proventos'] = df['Proventos'].str.replace(',', '.', regex=False)  # Troca vírgula por ponto
+            df['Proventos'] = df['Proventos'].str.replace(' ', '', regex=False)  # Remove espaços
+
+            # Converter para numérico
+            df['Proventos'] = pd.to_numeric(df['Proventos'], errors='coerce')
+            df['Ano'] = pd.to_numeric(df['Ano'], errors='coerce')
+
+            # Remover linhas com erro de conversão
+            df = df.dropna()
+
+            if df.empty:
+                avisos.append(('warning', f"⚠️ Erro na conversão de dados para {acao.upper()}"))
+                return None, avisos
+
+            # Ajustar escala se necessário
+            if df['Proventos'].mean() > 100:
+                df['Proventos'] = df['Proventos'] / 100
+
+            df['Proventos'] = df['Proventos'].round(2)
+            df['Ano'] = df['Ano'].astype(int)
+
+            # Ordenar por ano
+            df = df.sort_values('Ano').reset_index(drop=True)
+
+            return df, avisos
+
+        except Exception as e:
+            avisos.append(('error', f"❌ Erro no processamento para {acao.upper()}: {str(e)}"))
+            return None, avisos
+
+    except Exception as e:
+        avisos.append(('error', f"❌ Erro geral para {acao.upper()}: {str(e)}"))
+        return None, avisos
+
+
+def processar_acao(acao, html, config=None, instrumentacao=None):
+    """Extrai o histórico e calcula as projeções de uma ação.
+
+    Retorna ``(resultado, avisos)``; ``resultado`` é None em caso de falha.
+    Para muitas ações, prefira extrair_historico por ação e uma única chamada
+    de projetar_painel sobre o painel de todas elas.
+    """
+    instrumentacao = instrumentacao if instrumentacao is not None else NULA
+    df, metodo_extracao, avisos = extrair_historico(acao, html, instrumentacao)
+    if df is None:
+        return None, avisos
+
+    try:
+        painel = df.assign(acao=acao)
+        with instrumentacao.medir(ETAPA_PROJECAO, acao):
+            calculo, resumo, projecoes = projetar_painel(painel, config)
+            resultados = montar_resultados(calculo, resumo, projecoes, config=config)
+    except Exception as e:
+        avisos.append(('error', f"❌ Erro no processamento para {acao.upper()}: {str(e)}"))
+        return None, avisos
+
+    for _, avisos_acao in avisos_projecao(resumo, config, [acao]):
+        avisos.extend(avisos_acao)
+    if not resultados:
+        return None, avisos
+    resultado = resultados[0]
+    resultado.metodo_extracao = metodo_extracao
+    return resultado, avisos
+
+
+def extrair_lote(paginas):
+    """Extrai um lote de ``(acao, html)`` ou ``(acao, html, extracao)`` em um processo de extração.
+
+    Devolve, por página, ``(acao, anos, proventos, metodo, avisos, registros)``:
+    as séries como arrays NumPy em vez de DataFrames, para reduzir o que
+    volta pelo IPC, e os registros de tempo de parse e normalização.
+    """
+    saida = []
+    for acao, html, *extracao in paginas:
+        instrumentacao = Instrumentacao()
+        df, metodo, avisos = extrair_historico(acao, html, instrumentacao, *extracao)
+        if df is None:
+            saida.append((acao, None, None, metodo, avisos, instrumentacao.registros))
+        else:
+            saida.append((acao, df['Ano'].to_numpy(), df['Proventos'].to_numpy(), metodo, avisos,
+                          instrumentacao.registros))
+    return saida
+
+
+def extrair_em_processos(paginas, processos, lote=LOTE_PROCESSOS, instrumentacao=None):
+    """Extrai ``(acao, html)`` (ou ``(acao, html, extracao)``, como em extrair_lote) em um pool de processos,
+    gerando ``(acao, df, metodo, avisos)``.
+
+    As páginas são enviadas em lotes de ``lote`` para amortizar o IPC e os
+    resultados saem na ordem em que os lotes terminam. ``paginas`` pode ser
+    um gerador: os lotes são enviados à medida que ele produz páginas. Com
+    ``instrumentacao``, registra parse, normalização e extração por ação.
+    """
+    instrumentacao = instrumentacao if instrumentacao is not None else NULA
+
+    def resultados(futuro):
+        for acao, anos, proventos, metodo, avisos, registros in futuro.result():
+            df = None if anos is None else pd.DataFrame({'Ano': anos, 'Proventos': proventos})
+            for registro in registros:
+                instrumentacao.registrar(**registro)
+            instrumentacao.registrar(ETAPA_EXTRACAO, acao, sum(registro['segundos'] for registro in registros),
+                                     metodo=metodo)
+            yield acao, df, metodo, avisos
+
+    # forkserver: a coleta ainda tem threads rodando, e fork com threads pode travar o filho
+    contexto = None
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        contexto = multiprocessing.get_context('forkserver')
+    with ProcessPoolExecutor(max_workers=processos, mp_context=contexto) as executor:
+        pendentes = set()
+        grupo = []
+        for pagina in paginas:
+            grupo.append(pagina)
+            if len(grupo) >= lote:
+                pendentes.add(executor.submit(extrair_lote, grupo))
+                grupo = []
+            # Entrega o que já terminou sem esperar o fim da coleta
+            prontos = {futuro for futuro in pendentes if futuro.done()}
+            pendentes -= prontos
+            for futuro in prontos:
+                yield from resultados(futuro)
+        if grupo:
+            pendentes.add(executor.submit(extrair_lote, grupo))
+        while pendentes:
+            prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                yield from resultados(futuro)
+
+
+def _historicos_salvos(armazem, acoes, instrumentacao):
+    """Lê várias ações do armazém em uma consulta e devolve ``{acao: df}`` com os códigos originais"""
+    with instrumentacao.medir(ETAPA_COLETA, origem='historico', acoes=len(acoes)):
+        salvo = armazem.carregar(acoes)
+    # O armazém guarda os códigos em minúsculas
+    codigos = {acao.lower(): acao for acao in acoes}
+    salvo['acao'] = salvo['acao'].map(codigos)
+    return dict(tuple(salvo.groupby('acao', sort=False)))
+
+
+def _avisos_coleta(pagina):
+    """Mensagens de uma página que falhou na coleta; None se ela pode ser extraída"""
+    acao = pagina['acao']
+    if pagina['erro']:
+        return [('error', f"❌ Erro na requisição para {acao.upper()}: {pagina['erro']}")]
+    if pagina['status'] != 200:
+        return [('warning', f"⚠️ Status {pagina['status']} para {acao.upper()}")]
+    return None
+
+
+def _extrair_paginas(paginas, extrair, instrumentacao, processos=None):
+    """Gera ``(acao, df, avisos)`` para cada página coletada, extraindo na thread atual ou em ``processos``"""
+    falhas = []
+
+    def extraiveis():
+        for pagina in paginas:
+            instrumentacao.registrar(
+                ETAPA_COLETA, pagina['acao'], pagina.get('segundos'), bytes=pagina.get('bytes'),
+                espera=pagina.get('espera'), origem=pagina.get('origem'), backend=pagina.get('backend'),
+                status=pagina['status']
+            )
+            avisos = _avisos_coleta(pagina)
+            if avisos is None:
+                yield pagina['acao'], pagina['html'], pagina.get('extracao')
+            else:
+                falhas.append((pagina['acao'], None, avisos))
+
+    if processos:
+        extraidas = ((acao, df, avisos) for acao, df, _, avisos in
+                     extrair_em_processos(extraiveis(), processos, instrumentacao=instrumentacao))
+    else:
+        def extraidas_aqui():
+            for acao, html, extracao in extraiveis():
+                with instrumentacao.medir(ETAPA_EXTRACAO, acao) as registro:
+                    df, registro['metodo'], avisos = extrair(acao, html, extracao=extracao)
+                yield acao, df, avisos
+        extraidas = extraidas_aqui()
+
+    for extraida in extraidas:
+        while falhas:
+            yield falhas.pop(0)
+        yield extraida
+    while falhas:
+        yield falhas.pop(0)
+
+
+def coletar_historicos(acoes, max_concorrencia=MAX_CONCORRENCIA_PADRAO,
+                       requisicoes_por_segundo=REQUISICOES_POR_SEGUNDO_PADRAO, cache=None,
+                       forcar_atualizacao=False, sessao=None, extrair=extrair_historico, ao_progredir=None,
+                       coletor=None, armazem=None, instrumentacao=None, processos=None):
+    """Gera ``(acao, df, avisos)`` para cada ação assim que o histórico dela fica pronto.
+
+    ``df`` é o histórico (acao, Ano, Proventos) ou None em caso de falha. Com
+    ``armazem``, as ações ainda atualizadas saem primeiro, lidas em uma única
+    consulta; as coletadas são gravadas em lotes, e as que falharem saem por
+    último, com o histórico salvo quando houver. Os demais parâmetros são os
+    de processar_lote.
+    """
+    instrumentacao = instrumentacao if instrumentacao is not None else NULA
+    if processos and extrair is not extrair_historico:
+        raise ValueError("Com processos, a extração é sempre extrair_historico: não passe extrair")
+    if extrair is extrair_historico:
+        extrair = partial(extrair_historico, instrumentacao=instrumentacao)
+    acoes = list(dict.fromkeys(acoes))  # sem repetições, que duplicariam o histórico no painel
+
+    a_coletar = acoes
+    if armazem is not None and not forcar_atualizacao:
+        a_coletar = armazem.desatualizadas(acoes)
+        coletar = set(a_coletar)
+        atualizadas = [acao for acao in acoes if acao not in coletar]
+        if atualizadas:
+            for acao in atualizadas:
+                instrumentacao.registrar(ETAPA_COLETA, acao, bytes=0, origem='historico')
+            for acao, df in _historicos_salvos(armazem, atualizadas, instrumentacao).items():
+                yield acao, df, []
+
+    if coletor is not None:
+        paginas = coletor.baixar_paginas(a_coletar, max_concorrencia=max_concorrencia)
+    else:
+        paginas = baixar_paginas(
+            a_coletar,
+            max_concorrencia=max_concorrencia,
+            requisicoes_por_segundo=requisicoes_por_segundo,
+            cache=cache,
+            forcar_atualizacao=forcar_atualizacao,
+            sessao=sessao
+        )
+
+    para_gravar = []
+    falhas = []
+    for i, (acao, df, avisos) in enumerate(_extrair_paginas(paginas, extrair, instrumentacao, processos)):
+        if ao_progredir is not None:
+            ao_progredir(i + 1, len(a_coletar), acao)
+
+        if df is None:
+            if armazem is None:
+                yield acao, None, avisos
+            else:
+                falhas.append((acao, avisos))
+            continue
+
+        df = df.assign(acao=acao)
+        if armazem is not None:
+            para_gravar.append(df)
+            if len(para_gravar) >= LOTE_GRAVACAO:
+                armazem.salvar(pd.concat(para_gravar, ignore_index=True))
+                para_gravar = []
+        yield acao, df, avisos
+
+    if armazem is None:
+        return
+    if para_gravar:
+        armazem.salvar(pd.concat(para_gravar, ignore_index=True))
+    salvos = _historicos_salvos(armazem, [acao for acao, _ in falhas], instrumentacao) if falhas else {}
+    for acao, avisos in falhas:
+        df = salvos.get(acao)
+        if df is not None:
+            avisos.append(('info', f"💾 {acao.upper()}: usando o histórico salvo localmente"))
+        yield acao, df, avisos
+
+
+def _projetar(historicos, avisos_por_acao, config, instrumentacao, ordem=None):
+    """Projeta de uma vez o painel dos históricos; com ``ordem``, ordena ações e mensagens por ela"""
+    if ordem is not None:
+        avisos_por_acao.sort(key=lambda item: ordem[item[0]])
+    if not historicos:
+        return None, None, None, avisos_por_acao
+
+    # Projeção de todas as ações de uma vez, sobre o painel (acao, Ano, Proventos)
+    painel = pd.concat(historicos, ignore_index=True)
+    if ordem is not None:
+        painel = (painel.assign(_posicao=painel['acao'].map(ordem))
+                  .sort_values(['_posicao', 'Ano'], kind='stable', ignore_index=True)
+                  .drop(columns='_posicao'))
+    with instrumentacao.medir(ETAPA_PROJECAO, acoes=painel['acao'].nunique()):
+        calculo, resumo, projecoes = projetar_painel(painel, config)
+    avisos_por_acao.extend(avisos_projecao(resumo, config, painel['acao']))
+    if ordem is not None:
+        avisos_por_acao.sort(key=lambda item: ordem[item[0]])
+    return calculo, resumo, projecoes, avisos_por_acao
+
+
+def processar_lote(acoes, config=None, max_concorrencia=MAX_CONCORRENCIA_PADRAO,
+                   requisicoes_por_segundo=REQUISICOES_POR_SEGUNDO_PADRAO, cache=None,
+                   forcar_atualizacao=False, sessao=None, extrair=extrair_historico, ao_progredir=None,
+                   coletor=None, armazem=None, instrumentacao=None, processos=None):
+    """Coleta, extrai e projeta uma lista de ações.
+
+    ``extrair(acao, html, extracao=None)`` permite trocar a etapa de extração
+    (por exemplo, por uma versão memoizada); ``extracao`` é o resultado de
+    extrair_dados que o coletor já tiver calculado para a página.
+    ``ao_progredir(concluidas, total, acao)`` é chamado na thread do chamador
+    a cada página processada. Com ``coletor`` (um ColetorComFallback),
+    a coleta passa pelos backends dele em vez do HTTP direto. Com ``armazem``
+    (um ArmazemHistorico), só as ações desatualizadas são coletadas; as demais,
+    e as que falharem mas tiverem histórico salvo, são lidas do armazém.
+    Com ``instrumentacao``, registra por ação a coleta (tempo, bytes, origem)
+    e a extração (tempo, método), além da projeção em lote. Com ``processos``,
+    parse e normalização rodam nesse número de processos, em lotes de
+    LOTE_PROCESSOS páginas, em vez de na thread do chamador. ``config`` (um
+    ConfigProjecao) define ano base, horizonte e regras da projeção. Retorna
+    ``(calculo, resumo, projecoes, avisos_por_acao)``, com os três primeiros
+    None se nenhuma ação tiver dados.
+    """
+    instrumentacao = instrumentacao if instrumentacao is not None else NULA
+    acoes = list(dict.fromkeys(acoes))
+    historicos = []
+    avisos_por_acao = []
+    for acao, df, avisos in coletar_historicos(
+            acoes, max_concorrencia, requisicoes_por_segundo, cache, forcar_atualizacao, sessao, extrair,
+            ao_progredir, coletor, armazem, instrumentacao, processos):
+        if df is not None:
+            historicos.append(df)
+        if avisos:
+            avisos_por_acao.append((acao, avisos))
+
+    # Manter a ordem de entrada nas tabelas e mensagens
+    ordem = {acao: i for i, acao in enumerate(acoes)}
+    return _projetar(historicos, avisos_por_acao, config, instrumentacao, ordem)
+
+
+def processar_fluxo(acoes, config=None, max_concorrencia=MAX_CONCORRENCIA_PADRAO,
+                    requisicoes_por_segundo=REQUISICOES_POR_SEGUNDO_PADRAO, cache=None,
+                    forcar_atualizacao=False, sessao=None, extrair=extrair_historico, ao_progredir=None,
+                    coletor=None, armazem=None, instrumentacao=None, intervalo=INTERVALO_FLUXO_PADRAO,
+                    processos=None, ao_coletar=None):
+    """Versão em fluxo de processar_lote, para exibir resultados à medida que chegam.
+
+    Gera lotes parciais ``(calculo, resumo, projecoes, avisos_por_acao)`` com
+    as ações que ficaram prontas desde o lote anterior: o primeiro sai assim
+    que houver um histórico, os seguintes a cada ``intervalo`` segundos, cada
+    um projetado em uma única chamada vetorizada. As ações vêm na ordem de
+    chegada e só os históricos do lote corrente ficam em memória.
+    ``ao_coletar(acao, df, avisos)`` recebe cada histórico antes da projeção,
+    para quem quiser guardá-los e projetá-los de novo com outra configuração.
+    """
+    instrumentacao = instrumentacao if instrumentacao is not None else NULA
+    acoes = list(dict.fromkeys(acoes))
+    historicos = []
+    avisos_por_acao = []
+    ultimo_lote = None
+    for acao, df, avisos in coletar_historicos(
+            acoes, max_concorrencia, requisicoes_por_segundo, cache, forcar_atualizacao, sessao, extrair,
+            ao_progredir, coletor, armazem, instrumentacao, processos):
+        if ao_coletar is not None:
+            ao_coletar(acao, df, avisos)
+        if df is not None:
+            historicos.append(df)
+        if avisos:
+            avisos_por_acao.append((acao, avisos))
+        if historicos and (ultimo_lote is None or time.perf_counter() - ultimo_lote >= intervalo):
+            yield _projetar(historicos, avisos_por_acao, config, instrumentacao)
+            historicos = []
+            avisos_por_acao = []
+            ultimo_lote = time.perf_counter()
+
+    if historicos or avisos_por_acao:
+        yield _projetar(historicos, avisos_por_acao, config, instrumentacao)
@@ -0,0 +1,460 @@
+from dataclasses import dataclass, replace
+
+import numpy as np
+import pandas as pd
+
+# Valores de CONFIG_PADRAO; para outros anos ou regras, passe um ConfigProjecao
+ANOS_PROJECAO = (2025, 2026, 2027, 2028, 2029)
+ANO_BASE = 2024
+ANO_PARCIAL = 2025  # Ano corrente, ainda incompleto: fica fora das médias
+
+# Ações cujo dividendo do ano base é substituído pelo do ano parcial
+ACOES_BASE_ANO_PARCIAL = {'ISAE4'}
+
+CENARIOS = ('Cenário 1', 'Cenário 2', 'Cenário 3')
+
+# Simulação Monte Carlo das variações anuais
+SIMULACOES_PADRAO = 10000
+PERCENTIS = (10, 50, 90)
+ELEMENTOS_POR_BLOCO = 4_000_000  # limita a memória: ações x simulações x anos por bloco
+
+
+@dataclass(frozen=True)
+class RegraAcao:
+    """Ajuste da projeção de uma única ação.
+
+    Com ``base_do_ano``, o dividendo do ano base passa a ser o desse ano
+    (tipicamente o parcial); os anos de ``excluir_anos`` ficam fora do
+    cálculo só para esta ação.
+    """
+    acao: str
+    base_do_ano: int | None = None
+    excluir_anos: tuple = ()
+
+    def __post_init__(self):
+        object.__setattr__(self, 'acao', self.acao.strip().upper())
+        object.__setattr__(self, 'excluir_anos', tuple(sorted({int(ano) for ano in self.excluir_anos})))
+
+    @classmethod
+    def de_texto(cls, texto):
+        """Lê ``'ACAO: base=ANO; excluir=ANO,ANO'``; as duas opções são facultativas"""
+        def ano(valor):
+            try:
+                return int(valor)
+            except ValueError:
+                raise ValueError(f"Ano inválido na regra {texto!r}: {valor.strip()!r}") from None
+
+        acao, _, opcoes = texto.partition(':')
+        if not acao.strip():
+            raise ValueError(f"Regra sem código de ação: {texto!r}")
+        base_do_ano, excluir_anos = None, ()
+        for opcao in filter(None, (opcao.strip() for opcao in opcoes.split(';'))):
+            chave, _, valor = opcao.partition('=')
+            chave = chave.strip().lower()
+            if chave == 'base':
+                base_do_ano = ano(valor)
+            elif chave == 'excluir':
+                excluir_anos = tuple(ano(valor) for valor in valor.split(',') if valor.strip())
+            else:
+                raise ValueError(f"Opção desconhecida na regra {texto!r}: {chave!r}")
+        return cls(acao, base_do_ano, excluir_anos)
+
+    def para_texto(self):
+        opcoes = []
+        if self.base_do_ano is not None:
+            opcoes.append(f'base={self.base_do_ano}')
+        if self.excluir_anos:
+            opcoes.append(f"excluir={','.join(map(str, self.excluir_anos))}")
+        return f"{self.acao}: {'; '.join(opcoes)}"
+
+    def descricao(self, ano_base):
+        """Texto curto para a interface, por exemplo 'Dividendo 2024 = Dividendo 2025'"""
+        partes = []
+        if self.base_do_ano is not None:
+            partes.append(f'Dividendo {ano_base} = Dividendo {self.base_do_ano}')
+        if self.excluir_anos:
+            partes.append(f"sem {', '.join(map(str, self.excluir_anos))}")
+        return '; '.join(partes)
+
+
+@dataclass(frozen=True)
+class ConfigProjecao:
+    """Parâmetros da projeção: ano base, horizonte, anos parciais e regras por ação.
+
+    Os anos de ``anos_parciais`` e os posteriores ao ano base ficam fora das
+    médias; as projeções cobrem os ``horizonte`` anos seguintes ao ano base.
+    É imutável e hasheável, então serve de chave de cache: trocar a
+    configuração só exige projetar de novo os históricos já extraídos.
+    """
+    ano_base: int = ANO_BASE
+    horizonte: int = len(ANOS_PROJECAO)
+    anos_parciais: tuple = (ANO_PARCIAL,)
+    regras: tuple = tuple(RegraAcao(acao, base_do_ano=ANO_PARCIAL) for acao in sorted(ACOES_BASE_ANO_PARCIAL))
+
+    def __post_init__(self):
+        if self.horizonte < 1:
+            raise ValueError(f"O horizonte precisa ter ao menos um ano: {self.horizonte}")
+        object.__setattr__(self, 'ano_base', int(self.ano_base))
+        object.__setattr__(self, 'horizonte', int(self.horizonte))
+        object.__setattr__(self, 'anos_parciais', tuple(sorted({int(ano) for ano in self.anos_parciais})))
+        object.__setattr__(self, 'regras', tuple(self.regras))
+        acoes = [regra.acao for regra in self.regras]
+        repetidas = sorted({acao for acao in acoes if acoes.count(acao) > 1})
+        if repetidas:
+            raise ValueError(f"Mais de uma regra para: {', '.join(repetidas)}")
+
+    @property
+    def anos_projecao(self):
+        return tuple(range(self.ano_base + 1, self.ano_base + 1 + self.horizonte))
+
+    @property
+    def ano_final(self):
+        return self.ano_base + self.horizonte
+
+    def regra(self, acao):
+        """Regra da ação (em qualquer caixa), ou None"""
+        acao = acao.upper()
+        return next((regra for regra in self.regras if regra.acao == acao), None)
+
+    def com(self, **mudancas):
+        """Cópia com alguns campos trocados"""
+        return replace(self, **mudancas)
+
+    def para_dict(self):
+        """Representação serializável em JSON; ConfigProjecao.de_dict faz o caminho inverso"""
+        return {
+            'ano_base': self.ano_base,
+            'horizonte': self.horizonte,
+            'anos_parciais': list(self.anos_parciais),
+            'regras': [regra.para_texto() for regra in self.regras],
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        """Configuração a partir de um dicionário; campos ausentes ficam com o valor padrão"""
+        desconhecidos = set(dados) - {'ano_base', 'horizonte', 'anos_parciais', 'regras'}
+        if desconhecidos:
+            raise ValueError(f"Campos desconhecidos na configuração: {', '.join(sorted(desconhecidos))}")
+        dados = dict(dados)
+        if 'regras' in dados:
+            dados['regras'] = tuple(regra if isinstance(regra, RegraAcao) else RegraAcao.de_texto(regra)
+                                    for regra in dados['regras'])
+        if 'anos_parciais' in dados:
+            dados['anos_parciais'] = tuple(dados['anos_parciais'])
+        return cls(**dados)
+
+
+CONFIG_PADRAO = ConfigProjecao()
+
+
+def completar_painel(painel, config=None):
+    """Preenche os anos faltantes de cada ação com zero, aplica as regras e calcula as variações.
+
+    ``painel`` é um DataFrame longo com colunas ``acao``, ``Ano`` e ``Proventos``.
+    Todas as ações são tratadas de uma vez, sem laço por ação. Retorna
+    ``(calculo, substituidas)``: o painel sem os anos excluídos pela
+    configuração e as ações cujo dividendo do ano base foi substituído.
+    """
+    config = CONFIG_PADRAO if config is None else config
+    # Um (acao, Ano) repetido multiplicaria as linhas no merge abaixo: vale a última ocorrência
+    painel = painel[['acao', 'Ano', 'Proventos']].drop_duplicates(['acao', 'Ano'], keep='last')
+    anos = painel.groupby('acao', sort=False)['Ano']
+    ano_min = anos.min()
+    quantidade = (anos.max() - ano_min + 1).to_numpy()
+
+    # Sequência ano_min..ano_max de cada ação, concatenadas
+    deslocamento = np.arange(quantidade.sum()) - np.repeat(np.cumsum(quantidade) - quantidade, quantidade)
+    completo = pd.DataFrame({
+        'acao': np.repeat(ano_min.index.to_numpy(), quantidade),
+        'Ano': np.repeat(ano_min.to_numpy(), quantidade) + deslocamento
+    })
+    completo = completo.merge(painel, on=['acao', 'Ano'], how='left')
+    completo['Proventos'] = completo['Proventos'].fillna(0)
+    codigos = completo['acao'].str.upper()
+
+    # Regras com base_do_ano: dividendo do ano base = dividendo daquele ano
+    substituidas = pd.Index([])
+    fontes = {regra.acao: regra.base_do_ano for regra in config.regras if regra.base_do_ano is not None}
+    if fontes:
+        no_ano_fonte = completo[completo['Ano'] == codigos.map(fontes)].drop_duplicates('acao')
+        alvo = (completo['Ano'] == config.ano_base) & completo['acao'].isin(no_ano_fonte['acao'])
+        completo.loc[alvo, 'Proventos'] = completo.loc[alvo, 'acao'].map(no_ano_fonte.set_index('acao')['Proventos'])
+        substituidas = pd.Index(completo.loc[alvo, 'acao'].unique())
+
+    # Anos parciais, posteriores ao ano base e excluídos por regra não entram nas variações
+    excluidos = completo['Ano'].isin(config.anos_parciais) | (completo['Ano'] > config.ano_base)
+    pares = [(regra.acao, ano) for regra in config.regras for ano in regra.excluir_anos]
+    if pares:
+        excluidos |= pd.MultiIndex.from_arrays([codigos, completo['Ano']]).isin(pares)
+    calculo = completo[~excluidos.to_numpy()].reset_index(drop=True)
+
+    calculo['Variação'] = calculo.groupby('acao', sort=False)['Proventos'].diff().fillna(0)
+    return calculo, substituidas
+
+
+def projetar_painel(painel, config=None):
+    """Calcula médias de variação e os três cenários para todas as ações do painel.
+
+    Retorna ``(calculo, resumo, projecoes)``: o painel completo sem os anos
+    excluídos, um DataFrame indexado por ação com o dividendo base e as médias,
+    e um DataFrame longo com ``acao``, ``Ano`` e uma coluna por cenário.
+    ``config`` (um ConfigProjecao) define ano base, horizonte e regras; sem
+    ela, vale CONFIG_PADRAO. Só depende do histórico: para outra configuração,
+    basta chamar de novo sobre o mesmo painel.
+    """
+    config = CONFIG_PADRAO if config is None else config
+    calculo, substituidas = completar_painel(painel, config)
+
+    por_acao = calculo.groupby('acao', sort=False)
+    variacao_avg = por_acao['Variação'].mean()
+    variacao_avg5 = por_acao.tail(5).groupby('acao', sort=False)['Variação'].mean()
+    variacao_avg2 = por_acao.tail(2).groupby('acao', sort=False)['Variação'].mean()
+
+    # Dividendo base: o do ano base, ou o último disponível
+    ultimo = por_acao['Proventos'].last()
+    no_ano_base = calculo[calculo['Ano'] == config.ano_base].groupby('acao', sort=False)['Proventos'].first()
+    dividendo_base = no_ano_base.reindex(ultimo.index).fillna(ultimo)
+
+    resumo = pd.DataFrame({
+        'dividendo_base': dividendo_base,
+        'variacao_avg': variacao_avg,
+        'variacao_avg5': variacao_avg5.reindex(ultimo.index),
+        'variacao_avg2': variacao_avg2.reindex(ultimo.index),
+    })
+    descricoes = {regra.acao: regra.descricao(config.ano_base) for regra in config.regras}
+    codigos = resumo.index.str.upper()
+    resumo['tratamento_especial'] = codigos.isin(list(descricoes))
+    resumo['descricao_tratamento'] = [descricoes.get(codigo) for codigo in codigos]
+    resumo['base_substituida'] = resumo.index.isin(substituidas)
+
+    # Projeção cumulativa com arredondamento a cada ano, para todas as ações e cenários
+    anos_projecao = list(config.anos_projecao)
+    medias = resumo[['variacao_avg', 'variacao_avg5', 'variacao_avg2']].to_numpy()
+    valores = np.empty((len(resumo), len(CENARIOS), len(anos_projecao)))
+    atual = np.repeat(resumo[['dividendo_base']].to_numpy(), len(CENARIOS), axis=1)
+    for passo in range(len(anos_projecao)):
+        atual = np.round(atual + medias, 2)
+        valores[:, :, passo] = atual
+
+    projecoes = pd.DataFrame({
+        'acao': np.repeat(resumo.index.to_numpy(), len(anos_projecao)),
+        'Ano': np.tile(anos_projecao, len(resumo))
+    })
+    for i, cenario in enumerate(CENARIOS):
+        projecoes[cenario] = valores[:, i, :].ravel()
+
+    return calculo, resumo, projecoes
+
+
+def simular_painel(calculo, resumo, config=None, simulacoes=SIMULACOES_PADRAO, semente=None,
+                   percentis=PERCENTIS):
+    """Faixas de percentis por bootstrap das variações anuais de cada ação.
+
+    Cada caminho sorteia, com reposição, uma variação histórica da própria ação
+    para cada ano projetado e a acumula sobre o dividendo base. Todas as ações
+    e simulações de um bloco são sorteadas de uma vez como arrays NumPy; os
+    blocos só existem para limitar a memória. Retorna um DataFrame longo com
+    ``acao``, ``Ano`` e uma coluna ``P<n>`` por percentil. Os anos projetados
+    são os de ``config``, que deve ser a mesma usada em projetar_painel.
+    Dividendo não fica negativo: os caminhos são limitados a zero antes dos
+    percentis.
+    """
+    anos_projecao = list((CONFIG_PADRAO if config is None else config).anos_projecao)
+    posicao = {acao: i for i, acao in enumerate(resumo.index)}
+
+    # A primeira linha de cada ação não tem ano anterior: não é uma variação observada
+    observadas = calculo[calculo.groupby('acao', sort=False).cumcount() > 0]
+    observadas = observadas.assign(_posicao=observadas['acao'].map(posicao)).sort_values('_posicao', kind='stable')
+    contagem = observadas.groupby('_posicao').size().reindex(range(len(resumo)), fill_value=0).to_numpy()
+
+    # Ações sem variação observada sorteiam sempre zero
+    variacoes = np.append(observadas['Variação'].to_numpy(dtype=float), 0.0)
+    inicio = np.where(contagem > 0, np.cumsum(contagem) - contagem, len(variacoes) - 1)
+    quantidade = np.maximum(contagem, 1)
+    base = resumo['dividendo_base'].to_numpy(dtype=float)
+
+    gerador = np.random.default_rng(semente)
+    faixas = np.empty((len(percentis), len(resumo), len(anos_projecao)))
+    por_bloco = max(1, ELEMENTOS_POR_BLOCO // max(1, simulacoes * len(anos_projecao)))
+    for ini in range(0, len(resumo), por_bloco):
+        bloco = slice(ini, ini + por_bloco)
+        sorteios = gerador.integers(0, quantidade[bloco, None, None],
+                                    size=(len(base[bloco]), simulacoes, len(anos_projecao)))
+        caminhos = base[bloco, None, None] + np.cumsum(variacoes[inicio[bloco, None, None] + sorteios], axis=2)
+        np.maximum(caminhos, 0, out=caminhos)
+        faixas[:, bloco, :] = np.percentile(caminhos, percentis, axis=1)
+
+    resultado = pd.DataFrame({
+        'acao': np.repeat(resumo.index.to_numpy(), len(anos_projecao)),
+        'Ano': np.tile(anos_projecao, len(resumo))
+    })
+    for i, percentil in enumerate(percentis):
+        resultado[f'P{percentil}'] = np.round(faixas[i].ravel(), 2)
+    return resultado
+
+
+def avisos_projecao(resumo, config=None, acoes=None):
+    """Mensagens da etapa de projeção, como pares (acao, [(nivel, mensagem)]).
+
+    Com ``acoes`` (as ações do painel projetado), avisa também das que ficaram
+    fora de ``resumo`` por não terem nenhum ano no cálculo.
+    """
+    config = CONFIG_PADRAO if config is None else config
+    avisos = []
+    for acao, linha in resumo[resumo['base_substituida']].iterrows():
+        avisos.append((acao, [('info', f"🔄 {acao.upper()}: Usando dividendo de {config.regra(acao).base_do_ano} "
+                                       f"(R$ {linha['dividendo_base']:.2f}) como base para {config.ano_base}")]))
+    if acoes is not None:
+        for acao in pd.Index(acoes).unique().difference(resumo.index, sort=False):
+            avisos.append((acao, [('warning', f"⚠️ Sem dados para projetar {acao.upper()}: o histórico só tem anos "
+                                              f"parciais, posteriores a {config.ano_base} ou excluídos por regra")]))
+    return avisos
+
+
+@dataclass(slots=True, eq=False)
+class ResultadoAcao:
+    """Resultado de uma ação, guardado em arrays NumPy em vez de DataFrames.
+
+    ``anos``, ``proventos`` e ``variacoes`` cobrem o histórico sem os anos
+    excluídos; ``cenarios`` tem uma linha por cenário e ``faixas`` (opcional)
+    um array por percentil, alinhados a ``anos_projecao``. Vindos de
+    montar_resultados, são fatias dos arrays do lote, não cópias por ação.
+    As tabelas das abas são montadas só quando pedidas.
+    """
+    acao: str
+    anos: np.ndarray
+    proventos: np.ndarray
+    variacoes: np.ndarray
+    anos_projecao: np.ndarray
+    cenarios: np.ndarray
+    dividendo_base: float
+    variacao_avg: float
+    variacao_avg5: float
+    variacao_avg2: float
+    tratamento_especial: bool = False
+    faixas: dict | None = None
+    metodo_extracao: str | None = None
+    ano_base: int = ANO_BASE
+    descricao_tratamento: str | None = None
+
+    @property
+    def fim_historico(self):
+        """Quantidade de anos até o ano base (os anos estão em ordem crescente)"""
+        return int(np.searchsorted(self.anos, self.ano_base, side='right'))
+
+    @property
+    def anos_historico(self):
+        return self.anos[:self.fim_historico]
+
+    @property
+    def proventos_historico(self):
+        return self.proventos[:self.fim_historico]
+
+    @property
+    def projecao_cenario1(self):
+        return self.cenarios[0]
+
+    @property
+    def projecao_cenario2(self):
+        return self.cenarios[1]
+
+    @property
+    def projecao_cenario3(self):
+        return self.cenarios[2]
+
+    def tabela_historico(self, completo=False):
+        """Ano, Proventos e Variação até o ano base (ou de todo o cálculo, com ``completo``)"""
+        fim = len(self.anos) if completo else self.fim_historico
+        return pd.DataFrame({
+            'Ano': self.anos[:fim],
+            'Proventos': self.proventos[:fim],
+            'Variação': self.variacoes[:fim],
+        })
+
+    def tabela_projecoes(self):
+        """Um ano projetado por linha, com os cenários e os percentis simulados"""
+        tabela = {'Ano': self.anos_projecao}
+        for cenario, valores in zip(CENARIOS, self.cenarios):
+            tabela[cenario] = valores
+        tabela.update(self.faixas or {})
+        return pd.DataFrame(tabela)
+
+
+def montar_resultados(calculo, resumo, projecoes, faixas=None, config=None):
+    """Converte a saída de projetar_painel em um ResultadoAcao por ação.
+
+    O lote é convertido para NumPy uma única vez e cada resultado recebe
+    fatias desses arrays. Com ``faixas`` (saída de simular_painel), cada
+    resultado ganha o dicionário ``{'P10': array, ...}``. ``config`` é a
+    mesma passada a projetar_painel.
+    """
+    config = CONFIG_PADRAO if config is None else config
+    quantidade = len(resumo)
+    if not quantidade:
+        return []
+    # completar_painel gera as linhas de cada ação contíguas, na ordem de resumo
+    tamanhos = calculo.groupby('acao', sort=False).size().reindex(resumo.index).to_numpy()
+    inicios = np.cumsum(tamanhos) - tamanhos
+    anos = calculo['Ano'].to_numpy()
+    proventos = calculo['Proventos'].to_numpy(dtype=float)
+    variacoes = calculo['Variação'].to_numpy(dtype=float)
+
+    # projecoes (e faixas) têm as ações em blocos de anos, na ordem de resumo
+    por_acao = len(projecoes) // quantidade
+    anos_projecao = projecoes['Ano'].to_numpy()[:por_acao]
+    cenarios = projecoes[list(CENARIOS)].to_numpy(dtype=float).reshape(quantidade, por_acao, -1).transpose(0, 2, 1)
+    percentis = []
+    if faixas is not None:
+        percentis = [coluna for coluna in faixas.columns if coluna.startswith('P')]
+        valores_faixas = faixas[percentis].to_numpy(dtype=float).reshape(quantidade, por_acao, -1).transpose(0, 2, 1)
+
+    dividendo_base = resumo['dividendo_base'].to_numpy(dtype=float)
+    medias = resumo[['variacao_avg', 'variacao_avg5', 'variacao_avg2']].to_numpy(dtype=float)
+    especiais = resumo['tratamento_especial'].to_numpy(dtype=bool)
+    descricoes = resumo['descricao_tratamento'].to_numpy()
+
+    resultados = []
+    for i, acao in enumerate(resumo.index):
+        trecho = slice(inicios[i], inicios[i] + tamanhos[i])
+        resultados.append(ResultadoAcao(
+            acao=acao,
+            anos=anos[trecho],
+            proventos=proventos[trecho],
+            variacoes=variacoes[trecho],
+            anos_projecao=anos_projecao,
+            cenarios=cenarios[i],
+            dividendo_base=float(dividendo_base[i]),
+            variacao_avg=float(medias[i, 0]),
+            variacao_avg5=float(medias[i, 1]),
+            variacao_avg2=float(medias[i, 2]),
+            tratamento_especial=bool(especiais[i]),
+            faixas={coluna: valores_faixas[i, j] for j, coluna in enumerate(percentis)} or None,
+            ano_base=config.ano_base,
+            descricao_tratamento=descricoes[i]
+        ))
+    return resultados
+
+
+def tabela_comparativa(resumo, projecoes, faixas=None, config=None):
+    """Resumo comparativo numérico: uma linha por ação, com os cenários no último ano projetado.
+
+    Com ``faixas``, inclui também os percentis simulados do último ano.
+    """
+    config = CONFIG_PADRAO if config is None else config
+    ultimo_ano = projecoes['Ano'].max()
+    finais = projecoes[projecoes['Ano'] == ultimo_ano].set_index('acao')
+    tabela = pd.DataFrame({
+        'Ação': resumo.index.str.upper(),
+        'Tratamento Especial': resumo['tratamento_especial'].to_numpy(),
+        f'Dividendo {config.ano_base}': resumo['dividendo_base'].to_numpy(),
+        'Var. Média Total': resumo['variacao_avg'].to_numpy(),
+        'Var. Média 5 Anos': resumo['variacao_avg5'].to_numpy(),
+        'Var. Média 2 Anos': resumo['variacao_avg2'].to_numpy(),
+    })
+    for cenario in CENARIOS:
+        tabela[f'{cenario} ({ultimo_ano})'] = finais[cenario].reindex(resumo.index).to_numpy()
+    if faixas is not None:
+        finais = faixas[faixas['Ano'] == ultimo_ano].set_index('acao')
+        for coluna in [coluna for coluna in faixas.columns if coluna.startswith('P')]:
+            tabela[f'{coluna} ({ultimo_ano})'] = finais[coluna].reindex(resumo.index).to_numpy()
+    return tabela
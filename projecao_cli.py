@@ -0,0 +1,279 @@
+"""Projeção de dividendos em lote, sem Streamlit.
+
+Uso:
+    python projecao_cli.py acoes.txt -o projecao.csv
+    python projecao_cli.py acoes.txt -o projecao.parquet --concorrencia 16
+    python projecao_cli.py acoes.txt --ano-base 2025 --horizonte 10 --regra "ISAE4: base=2026"
+    python projecao_cli.py acoes.txt --exportar completo.parquet.zip
+
+O arquivo de entrada lista os códigos das ações, um por linha ou separados
+por vírgula; linhas iniciadas por ``#`` são ignoradas.
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+
+from backends import criar_coletor_padrao
+from cache_paginas import DIRETORIO_PADRAO, TTL_PADRAO, CachePaginas
+from coleta import (BACKOFF_PADRAO, MAX_CONCORRENCIA_PADRAO, REQUISICOES_POR_SEGUNDO_PADRAO,
+                    TENTATIVAS_PADRAO, criar_sessao, validar_codigo_acao)
+from historico_store import CAMINHO_PADRAO as CAMINHO_HISTORICO_PADRAO, RETENCAO_PADRAO, ArmazemHistorico
+from instrumentacao import Instrumentacao
+
+logger = logging.getLogger('projecao_dividendos')
+
+NIVEIS_LOG = {'debug': logging.DEBUG, 'info': logging.INFO, 'warning': logging.WARNING, 'error': logging.ERROR}
+FORMATOS_EXPORTACAO = ('parquet', 'csv', 'xlsx')  # exportacao.FORMATOS, sem carregar pandas no --help
+
+
+def ler_acoes(caminho):
+    """Lê os códigos de um arquivo ('-' para stdin), sem duplicatas e na ordem original"""
+    arquivo = sys.stdin if caminho == '-' else open(caminho, encoding='utf-8')
+    with arquivo:
+        acoes = []
+        for linha in arquivo:
+            linha = linha.split('#', 1)[0]
+            for codigo in linha.replace(';', ',').split(','):
+                codigo = codigo.strip().lower()
+                if codigo and codigo not in acoes:
+                    acoes.append(codigo)
+    return acoes
+
+
+def projetar_acoes(acoes, config=None, max_concorrencia=MAX_CONCORRENCIA_PADRAO,
+                   requisicoes_por_segundo=REQUISICOES_POR_SEGUNDO_PADRAO, tentativas=TENTATIVAS_PADRAO,
+                   backoff=BACKOFF_PADRAO, cache=None, forcar_atualizacao=False, usar_navegador=False,
+                   armazem=None, instrumentacao=None, simulacoes=0, semente=None, processos=None,
+                   destino_exportacao=None, formato_exportacao=None):
+    """API importável: retorna ``(tabela, avisos_por_acao)``, com a tabela comparativa numérica.
+
+    Com ``simulacoes`` > 0, a tabela inclui os percentis da simulação Monte Carlo;
+    sem ``config`` (um ConfigProjecao), vale ``projecao.CONFIG_PADRAO``. Com
+    ``processos``, a extração das páginas roda nesse número de processos. Com
+    ``destino_exportacao``, grava também históricos, projeções anuais e resumo
+    completos (ver exportacao.exportar); o formato sai da extensão se omitido.
+    """
+    # pandas/numpy só são carregados aqui: --help e erros de argumento saem rápido
+    from exportacao import exportar, formato_do_caminho, lotes_projetados
+    from processamento import processar_lote
+    from projecao import simular_painel, tabela_comparativa
+
+    sessao = criar_sessao(max_conexoes=max_concorrencia, tentativas=tentativas, backoff=backoff)
+    coletor = None
+    if usar_navegador:
+        coletor = criar_coletor_padrao(sessao, cache, requisicoes_por_segundo, forcar_atualizacao)
+
+    calculo, resumo, projecoes, avisos_por_acao = processar_lote(
+        acoes,
+        config=config,
+        max_concorrencia=max_concorrencia,
+        requisicoes_por_segundo=requisicoes_por_segundo,
+        cache=cache,
+        forcar_atualizacao=forcar_atualizacao,
+        sessao=sessao,
+        coletor=coletor,
+        armazem=armazem,
+        instrumentacao=instrumentacao,
+        processos=processos
+    )
+    if resumo is None:
+        return None, avisos_por_acao
+
+    faixas = None
+    if simulacoes:
+        faixas = simular_painel(calculo, resumo, config, simulacoes, semente)
+    tabela = tabela_comparativa(resumo, projecoes, faixas, config)
+
+    if destino_exportacao is not None:
+        exportar(lotes_projetados(calculo, resumo, projecoes, faixas), destino_exportacao,
+                 formato_exportacao or formato_do_caminho(destino_exportacao), instrumentacao)
+    return tabela, avisos_por_acao
+
+
+def montar_config(args):
+    """ConfigProjecao do arquivo ``--config`` (ou o padrão), com as opções da linha de comando por cima"""
+    from projecao import CONFIG_PADRAO, ConfigProjecao, RegraAcao
+
+    config = CONFIG_PADRAO
+    if args.config:
+        with open(args.config, encoding='utf-8') as f:
+            config = ConfigProjecao.de_dict(json.load(f))
+    mudancas = {}
+    if args.ano_base is not None:
+        mudancas['ano_base'] = args.ano_base
+    if args.horizonte is not None:
+        mudancas['horizonte'] = args.horizonte
+    if args.anos_parciais is not None:
+        mudancas['anos_parciais'] = tuple(args.anos_parciais)
+    if args.sem_regras or args.regra:
+        # Uma --regra substitui a regra da mesma ação vinda do padrão ou do --config
+        novas = [RegraAcao.de_texto(texto) for texto in args.regra or ()]
+        mantidas = () if args.sem_regras else config.regras
+        substituidas = {regra.acao for regra in novas}
+        mudancas['regras'] = tuple(regra for regra in mantidas if regra.acao not in substituidas) + tuple(novas)
+    return config.com(**mudancas)
+
+
+def salvar_tabela(tabela, caminho):
+    """Grava em Parquet se a extensão for .parquet; caso contrário, em CSV"""
+    if caminho.lower().endswith('.parquet'):
+        tabela.to_parquet(caminho, index=False)
+    else:
+        tabela.to_csv(caminho, index=False)
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Projeção de dividendos em lote (sem interface)")
+    parser.add_argument('arquivo', help="arquivo com os códigos das ações ('-' para stdin)")
+    parser.add_argument('-o', '--saida', default='projecao_dividendos_cumulativa.csv',
+                        help="arquivo de saída (.csv ou .parquet)")
+    parser.add_argument('--concorrencia', type=int, default=MAX_CONCORRENCIA_PADRAO,
+                        help="requisições simultâneas")
+    parser.add_argument('--rps', type=float, default=REQUISICOES_POR_SEGUNDO_PADRAO,
+                        help="requisições por segundo por servidor")
+    parser.add_argument('--tentativas', type=int, default=TENTATIVAS_PADRAO,
+                        help="novas tentativas em erros transitórios")
+    parser.add_argument('--backoff', type=float, default=BACKOFF_PADRAO,
+                        help="espera inicial entre tentativas, em segundos")
+    parser.add_argument('--sem-cache', action='store_true', help="não usar o cache de páginas em disco")
+    parser.add_argument('--forcar-atualizacao', action='store_true', help="ignorar o cache e baixar tudo")
+    parser.add_argument('--dir-cache', default=DIRETORIO_PADRAO, help="diretório do cache de páginas")
+    parser.add_argument('--ttl-horas', type=float, default=TTL_PADRAO / 3600,
+                        help="validade do cache de páginas, em horas")
+    parser.add_argument('--sem-historico', action='store_true',
+                        help="não usar o histórico normalizado salvo localmente")
+    parser.add_argument('--historico', default=CAMINHO_HISTORICO_PADRAO,
+                        help="arquivo SQLite do histórico; só as ações desatualizadas são coletadas")
+    parser.add_argument('--retencao-dias', type=float, default=RETENCAO_PADRAO / 86400,
+                        help="remover do histórico as ações sem atualização há mais de N dias (0 mantém todas)")
+    parser.add_argument('--navegador', action='store_true',
+                        help="usar Firefox headless para as ações em que o HTTP não trouxer a tabela")
+    parser.add_argument('--processos', type=int, default=0,
+                        help="processos para o parse das páginas (0 extrai na thread principal)")
+    parser.add_argument('--simulacoes', type=int, default=0,
+                        help="caminhos Monte Carlo por ação para as colunas P10/P50/P90 (0 desativa)")
+    parser.add_argument('--semente', type=int, help="semente da simulação, para resultados reprodutíveis")
+    parser.add_argument('--config',
+                        help="JSON com ano_base, horizonte, anos_parciais e regras da projeção")
+    parser.add_argument('--ano-base', type=int, help="último ano completo; as projeções partem dele")
+    parser.add_argument('--horizonte', type=int, help="quantidade de anos projetados após o ano base")
+    parser.add_argument('--anos-parciais', type=int, nargs='*',
+                        help="anos incompletos, fora das médias (sem valores: nenhum)")
+    parser.add_argument('--regra', action='append',
+                        help="regra por ação, 'ACAO: base=ANO; excluir=ANO,ANO' (pode repetir)")
+    parser.add_argument('--sem-regras', action='store_true', help="descartar as regras padrão ou do --config")
+    parser.add_argument('--exportar',
+                        help="exportar históricos, projeções anuais e resumo completos "
+                             "(.parquet.zip, .csv.zip ou .xlsx)")
+    parser.add_argument('--formato-exportacao', choices=FORMATOS_EXPORTACAO,
+                        help="formato do --exportar, quando a extensão não o indica")
+    parser.add_argument('--diagnostico',
+                        help="gravar os tempos por ação e etapa neste arquivo (.json ou .csv)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="mostrar mensagens informativas")
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(levelname)s %(message)s'
+    )
+
+    acoes = ler_acoes(args.arquivo)
+    invalidas = [acao for acao in acoes if not validar_codigo_acao(acao)]
+    if invalidas:
+        logger.warning("Códigos inválidos: %s", ', '.join(invalidas))
+    acoes = [acao for acao in acoes if validar_codigo_acao(acao)]
+    if not acoes:
+        logger.error("Nenhuma ação válida foi informada")
+        return 2
+
+    try:
+        config = montar_config(args)
+    except (OSError, TypeError, ValueError) as e:
+        logger.error("Configuração da projeção inválida: %s", e)
+        return 2
+
+    formato_exportacao = None
+    if args.exportar:
+        from exportacao import DEPENDENCIAS, formato_do_caminho, formatos_disponiveis
+
+        try:
+            formato_exportacao = args.formato_exportacao or formato_do_caminho(args.exportar)
+        except ValueError as e:
+            logger.error("%s", e)
+            return 2
+        if formato_exportacao not in formatos_disponiveis():
+            logger.error("Dependência ausente para exportar em %s: %s", formato_exportacao,
+                         DEPENDENCIAS[formato_exportacao])
+            return 2
+
+    cache = None
+    if not args.sem_cache:
+        cache = CachePaginas(args.dir_cache, ttl=args.ttl_horas * 3600)
+    armazem = None
+    if not args.sem_historico:
+        armazem = ArmazemHistorico(args.historico, ttl=args.ttl_horas * 3600)
+
+    instrumentacao = Instrumentacao() if args.diagnostico else None
+
+    inicio = time.perf_counter()
+    tabela, avisos_por_acao = projetar_acoes(
+        acoes,
+        config=config,
+        max_concorrencia=args.concorrencia,
+        requisicoes_por_segundo=args.rps,
+        tentativas=args.tentativas,
+        backoff=args.backoff,
+        cache=cache,
+        forcar_atualizacao=args.forcar_atualizacao,
+        usar_navegador=args.navegador,
+        armazem=armazem,
+        instrumentacao=instrumentacao,
+        simulacoes=args.simulacoes,
+        semente=args.semente,
+        processos=args.processos,
+        destino_exportacao=args.exportar,
+        formato_exportacao=formato_exportacao
+    )
+    # Depois do processamento: as ações que falharem ainda usam o histórico salvo nesta execução
+    if armazem is not None and args.retencao_dias > 0:
+        removidas = armazem.limpar(antes_de=time.time() - args.retencao_dias * 86400)
+        if removidas:
+            logger.info("%d ações sem atualização há mais de %g dias removidas do histórico",
+                        removidas, args.retencao_dias)
+
+    for acao, avisos in avisos_por_acao:
+        for nivel, mensagem in avisos:
+            if nivel == 'debug':
+                logger.debug("%s: %s", acao.upper(), mensagem)
+            else:
+                logger.log(NIVEIS_LOG[nivel], "%s", mensagem)
+
+    if instrumentacao is not None:
+        with open(args.diagnostico, 'w', encoding='utf-8') as f:
+            f.write(instrumentacao.para_json() if args.diagnostico.lower().endswith('.json')
+                    else instrumentacao.para_csv())
+
+    if tabela is None:
+        logger.error("Nenhuma ação foi processada com sucesso")
+        return 1
+
+    try:
+        salvar_tabela(tabela, args.saida)
+    except ImportError as e:
+        logger.error("Dependência ausente para gravar %s: %s", args.saida, e)
+        return 2
+
+    logger.info("%d de %d ações projetadas em %.1f s -> %s",
+                len(tabela), len(acoes), time.perf_counter() - inicio, args.saida)
+    if args.exportar:
+        logger.info("Exportação completa (%s) -> %s", formato_exportacao, args.exportar)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,35 @@
 import streamlit as st
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-import plotly.graph_objects as go
-import re
+import hashlib
+import math
+import os
 import time
 import warnings
 
+from backends import criar_coletor_padrao
+from cache_paginas import TTL_PADRAO, CachePaginas
+from coleta import (BACKOFF_PADRAO, MAX_CONCORRENCIA_MAXIMA, MAX_CONCORRENCIA_PADRAO,
+                    REQUISICOES_POR_SEGUNDO_PADRAO, TENTATIVAS_PADRAO, criar_sessao, validar_codigo_acao)
+from exportacao import (EXTENSOES, TIPOS_MIME, exportar_arquivo_temporario, formatos_disponiveis, lotes_do_painel,
+                        lotes_projetados)
+from graficos import COLUNAS_MULTIPLOS_PADRAO, criar_grafico, criar_grafico_multiplos
+from historico_store import RETENCAO_PADRAO, ArmazemHistorico
+from instrumentacao import ETAPA_COLETA, ETAPA_GRAFICO, ETAPA_PROJECAO, ETAPA_TABELA, Instrumentacao
+from navegador import metricas_navegadores
+from processamento import extrair_historico, processar_fluxo
+from projecao import (CONFIG_PADRAO, SIMULACOES_PADRAO, ConfigProjecao, RegraAcao, avisos_projecao,
+                      montar_resultados, projetar_painel, simular_painel)
+from triagem import METRICAS, TOP_PADRAO, IndiceTriagem
+
 warnings.filterwarnings('ignore')
 
+MODO_PAGINAS = "📄 Por página"
+MODO_SELECAO = "🔎 Selecionar ações"
+MODO_MULTIPLOS = "🧩 Comparar todas"
+MODOS_GRAFICOS = (MODO_PAGINAS, MODO_SELECAO, MODO_MULTIPLOS)
+GRAFICOS_PARCIAIS = 5  # gráficos exibidos enquanto o processamento ainda não terminou
+ROTULOS_FORMATOS = {'parquet': "Parquet (ZIP)", 'csv': "CSV (ZIP)", 'xlsx': "Excel (XLSX)"}
+
 # Configuração da página
 st.set_page_config(
     page_title="Projeção de Dividendos",
@@ -18,359 +39,261 @@ st.set_page_config(
 )
 
 
-def validar_codigo_acao(codigo):
-    padrao = r'^[A-Za-z]{4}\d{1,2}$'
-    return bool(re.match(padrao, codigo))
-
+@st.cache_resource
+def _cache_paginas_compartilhada():
+    # Uma instância por processo, compartilhada entre as sessões: um só índice do diretório
+    return CachePaginas()
+
+
+def obter_cache_paginas(ttl):
+    # Cada TTL é só uma visão da cache compartilhada
+    return _cache_paginas_compartilhada().com_ttl(ttl)
+
+
+@st.cache_resource
+def obter_sessao(max_conexoes, tentativas, backoff):
+    # Sessão keep-alive reaproveitada entre reruns e sessões do Streamlit
+    return criar_sessao(max_conexoes=max_conexoes, tentativas=tentativas, backoff=backoff)
+
+
+@st.cache_resource
+def obter_armazem(ttl=TTL_PADRAO):
+    # Histórico normalizado em SQLite, compartilhado entre as sessões; uma instância por TTL, como o cache.
+    # Ações sem atualização há mais de RETENCAO_PADRAO saem na criação, uma vez por processo e TTL
+    armazem = ArmazemHistorico(ttl=ttl)
+    armazem.limpar(antes_de=time.time() - RETENCAO_PADRAO)
+    return armazem
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def obter_indice_triagem(versao, config):
+    # Refeito só quando o histórico salvo ou a configuração mudam; versao vem de ArmazemHistorico.versao()
+    return IndiceTriagem.do_armazem(obter_armazem(), config)
+
+
+@st.cache_data(max_entries=5000, show_spinner=False)
+def extrair_historico_cache(acao, hash_pagina, _html, _instrumentacao=None, _extracao=None):
+    # Chave: (ação, hash do conteúdo); o HTML e a extração já feita pelo coletor não são hasheados
+    return extrair_historico(acao, _html, _instrumentacao, _extracao)
+
+
+def hash_conteudo(html):
+    return hashlib.sha1(html.encode('utf-8')).hexdigest()
+
+
+def ler_config(ano_base, horizonte, anos_parciais, regras):
+    """ConfigProjecao a partir dos campos da barra lateral; ValueError se algum for inválido"""
+    anos = []
+    for ano in anos_parciais.replace(';', ',').split(','):
+        if ano.strip():
+            try:
+                anos.append(int(ano))
+            except ValueError:
+                raise ValueError(f"Ano parcial inválido: {ano.strip()!r}") from None
+    regras = tuple(RegraAcao.de_texto(linha) for linha in regras.splitlines() if linha.strip())
+    return ConfigProjecao(int(ano_base), int(horizonte), tuple(anos), regras)
+
+
+def projetar_historicos(config, simulacoes):
+    # Históricos da sessão projetados de novo, sem coleta nem parse, só quando a configuração ou a simulação mudam
+    chave = (config, simulacoes)
+    if st.session_state.get('chave_projecao') == chave:
+        return
+    painel = st.session_state.painel
+    instrumentacao = st.session_state.instrumentacao
+    resultados = []
+    projecao = None
+    avisos_por_acao = list(st.session_state.avisos_coleta)
+    if painel is not None:
+        with instrumentacao.medir(ETAPA_PROJECAO, acoes=painel['acao'].nunique()):
+            calculo, resumo, projecoes = projetar_painel(painel, config)
+        faixas = None
+        if simulacoes:
+            with instrumentacao.medir(ETAPA_PROJECAO, parte='simulacao', simulacoes=simulacoes):
+                faixas = simular_painel(calculo, resumo, config, simulacoes)
+        with instrumentacao.medir(ETAPA_PROJECAO, parte='resultados'):
+            resultados = montar_resultados(calculo, resumo, projecoes, faixas, config)
+        projecao = (calculo, resumo, projecoes, faixas)
+        avisos_por_acao.extend(avisos_projecao(resumo, config, painel['acao']))
+        ordem = {acao: i for i, acao in enumerate(st.session_state.acoes_processadas)}
+        avisos_por_acao.sort(key=lambda item: ordem[item[0]])
+
+    st.session_state.resultados = resultados
+    st.session_state.projecao = projecao
+    st.session_state.avisos_por_acao = avisos_por_acao
+    st.session_state.figuras = {}
+    st.session_state.chave_projecao = chave
+
+
+def obter_figura(resultado):
+    # Uma figura por resultado, reaproveitada entre reruns até o próximo processamento
+    figuras = st.session_state.setdefault('figuras', {})
+    if resultado.acao not in figuras:
+        figuras[resultado.acao] = criar_grafico(resultado)
+    return figuras[resultado.acao]
+
+
+def obter_figura_multiplos(resultados, colunas):
+    figuras = st.session_state.setdefault('figuras', {})
+    chave = ('multiplos', colunas)
+    if chave not in figuras:
+        figuras[chave] = criar_grafico_multiplos(resultados, colunas)
+    return figuras[chave]
+
+
+def exibir_grafico_acao(resultado, instrumentacao):
+    st.subheader(f"📈 {resultado.acao.upper()}")
+    if resultado.tratamento_especial:
+        st.info(f"🔄 **Tratamento Especial**: {resultado.descricao_tratamento}")
+
+    with instrumentacao.medir(ETAPA_GRAFICO, resultado.acao):
+        st.plotly_chart(obter_figura(resultado), use_container_width=True, key=f"grafico_{resultado.acao}")
+
+    ano_final = resultado.anos_projecao[-1]
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        label_base = f"💰 Dividendo {resultado.ano_base}" + ("*" if resultado.tratamento_especial else "")
+        st.metric(label_base, f"R$ {resultado.dividendo_base:.2f}")
+    with col2:
+        st.metric(f"📊 Cenário 1 ({ano_final})", f"R$ {resultado.projecao_cenario1[-1]:.2f}")
+    with col3:
+        st.metric(f"📊 Cenário 2 ({ano_final})", f"R$ {resultado.projecao_cenario2[-1]:.2f}")
+    with col4:
+        st.metric(f"📊 Cenário 3 ({ano_final})", f"R$ {resultado.projecao_cenario3[-1]:.2f}")
+    st.markdown("---")
 
-def processar_acao(acao, progress_bar, status_text):
-    try:
-        status_text.text(f"Processando {acao.upper()}...")
 
-        # Headers simples mas eficazes
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+def montar_tabela_resumo(resultados):
+    dados_comparativos = []
+    for resultado in resultados:
+        acao_nome = resultado.acao.upper()
+        if resultado.tratamento_especial:
+            acao_nome += "*"
+
+        ano_final = resultado.anos_projecao[-1]
+        linha = {
+            'Ação': acao_nome,
+            f'Dividendo {resultado.ano_base}': f"R$ {resultado.dividendo_base:.2f}",
+            'Var. Média Total': f"{resultado.variacao_avg:.2f}",
+            'Var. Média 5 Anos': f"{resultado.variacao_avg5:.2f}",
+            'Var. Média 2 Anos': f"{resultado.variacao_avg2:.2f}",
+            f'Cenário 1 ({ano_final})': f"R$ {resultado.projecao_cenario1[-1]:.2f}",
+            f'Cenário 2 ({ano_final})': f"R$ {resultado.projecao_cenario2[-1]:.2f}",
+            f'Cenário 3 ({ano_final})': f"R$ {resultado.projecao_cenario3[-1]:.2f}"
         }
+        for percentil, valores in (resultado.faixas or {}).items():
+            linha[f'{percentil} ({ano_final})'] = f"R$ {valores[-1]:.2f}"
+        dados_comparativos.append(linha)
+    return pd.DataFrame(dados_comparativos)
+
+
+def exibir_diagnostico(instrumentacao, tempo_processamento=None):
+    st.header("🩺 Diagnóstico")
+    registros = instrumentacao.tabela()
+    if registros.empty:
+        st.info("Nenhuma medição registrada.")
+        return
+
+    coletas = registros[(registros['etapa'] == ETAPA_COLETA) & registros['acao'].notna()]
+    origens = coletas['origem'] if 'origem' in coletas.columns else pd.Series(dtype=object)
+    acertos = int(origens.isin(['cache', 'revalidado', 'historico']).sum())
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        # Tempo de relógio: as etapas se sobrepõem (coletas concorrentes, parse dentro da extração),
+        # então a soma dos registros contaria o mesmo intervalo mais de uma vez
+        st.metric("⏱️ Tempo do processamento",
+                  f"{tempo_processamento:.2f} s" if tempo_processamento is not None else "—",
+                  help="Da coleta ao último resultado parcial; o tempo de cada etapa está na tabela abaixo")
+    with col2:
+        bytes_baixados = coletas['bytes'].sum() if 'bytes' in coletas.columns else 0
+        st.metric("📦 Baixado", f"{bytes_baixados / 1024:.0f} KB")
+    with col3:
+        st.metric("💾 Acertos de cache", acertos)
+    with col4:
+        st.metric("🌐 Coletas na rede", len(coletas) - acertos)
+
+    st.subheader("Por etapa")
+    st.dataframe(instrumentacao.resumo(), use_container_width=True)
+    st.subheader("Por ação")
+    st.dataframe(instrumentacao.por_acao(), use_container_width=True)
+
+    navegadores = metricas_navegadores()
+    if navegadores is not None:
+        st.subheader("Navegadores do servidor")
+        st.caption("Somados sobre todas as sessões deste processo")
+        st.dataframe(pd.DataFrame([navegadores]), use_container_width=True, hide_index=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("📥 Download JSON", data=instrumentacao.para_json(),
+                           file_name="diagnostico_projecao.json", mime="application/json")
+    with col2:
+        st.download_button("📥 Download CSV", data=instrumentacao.para_csv(),
+                           file_name="diagnostico_projecao.csv", mime="text/csv", key="diagnostico_csv")
+
+
+def exibir_triagem(config):
+    st.header("🔎 Triagem do Histórico Salvo")
+    indice = obter_indice_triagem(obter_armazem().versao(), config)
+    if not len(indice):
+        st.info("Nenhum histórico salvo ainda: processe ações com \"Guardar histórico localmente\" ativado.")
+        return
+
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        metrica = st.selectbox("Ordenar por:", list(METRICAS), index=list(METRICAS).index('cagr'),
+                               format_func=METRICAS.get, key='triagem_metrica')
+    with col2:
+        decrescente = st.radio("Ordem:", ("Maior primeiro", "Menor primeiro"), key='triagem_ordem') == "Maior primeiro"
+    with col3:
+        quantidade = st.number_input("Quantidade:", min_value=1, max_value=len(indice),
+                                     value=min(TOP_PADRAO, len(indice)), key='triagem_quantidade')
+
+    filtros = {}
+    with st.expander("Filtros"):
+        for filtrada in st.multiselect("Métricas:", list(METRICAS), format_func=METRICAS.get, key='triagem_filtros'):
+            col_min, col_max = st.columns(2)
+            minimo = col_min.number_input(f"{METRICAS[filtrada]} mínimo:", value=None, key=f'triagem_min_{filtrada}')
+            maximo = col_max.number_input(f"{METRICAS[filtrada]} máximo:", value=None, key=f'triagem_max_{filtrada}')
+            filtros[filtrada] = (minimo, maximo)
+
+    tabela = indice.tabela(indice.consultar(metrica, decrescente, int(quantidade), filtros))
+    st.caption(f"{int(indice.mascara(filtros).sum())} de {len(indice)} ações salvas passam nos filtros")
+    st.dataframe(tabela, use_container_width=True, hide_index=True)
+    st.download_button("📥 Download CSV", data=tabela.to_csv(index=False), file_name="triagem_dividendos.csv",
+                       mime="text/csv", key="triagem_csv")
+
+    armazem = obter_armazem()
+    st.caption(f"Exportação completa das {len(indice)} ações salvas, projetadas com a configuração atual")
+    exibir_exportacao(lambda: lotes_do_painel(armazem.carregar(), config), 'exportacao_triagem')
+
+
+def exibir_exportacao(gerar_lotes, chave, instrumentacao=None):
+    # gerar_lotes só roda no clique, fora do script: o arquivo é montado em disco, lote a lote
+    formatos = formatos_disponiveis()
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        formato = st.selectbox("Formato:", formatos, format_func=ROTULOS_FORMATOS.get, key=f'formato_{chave}',
+                               label_visibility="collapsed")
+    with col2:
+        st.download_button(
+            "📦 Exportar históricos, projeções anuais e resumo",
+            data=lambda: exportar_arquivo_temporario(gerar_lotes(), formato, instrumentacao),
+            file_name=f"projecao_dividendos{EXTENSOES[formato]}",
+            mime=TIPOS_MIME[formato],
+            key=chave,
+            help="Dados numéricos completos de todas as ações; Parquet e CSV vêm em um ZIP com um arquivo por tabela"
+        )
 
-        url = f'https://playinvest.com.br/dividendos/{acao}'
-
-        # Fazer requisição com encoding explícito
-        try:
-            response = requests.get(url, headers=headers, timeout=15)
-            response.encoding = 'utf-8'  # Forçar encoding UTF-8
-
-            if response.status_code != 200:
-                st.warning(f"⚠️ Status {response.status_code} para {acao.upper()}")
-                return None
-
-        except Exception as e:
-            st.error(f"❌ Erro na requisição para {acao.upper()}: {str(e)}")
-            return None
-
-        # Parse do HTML
-        try:
-            soup = BeautifulSoup(response.text, 'html.parser')
-        except Exception as e:
-            st.error(f"❌ Erro no parse HTML para {acao.upper()}: {str(e)}")
-            return None
-
-        # Extrair dados da tabela
-        data = []
-
-        # Tentar encontrar a tabela principal
-        tabela = soup.find('div', class_='card featured-card per-year-chart')
-
-        if tabela:
-            # Método 1: Procurar por tr/td
-            linhas = tabela.find_all('tr')
-            for linha in linhas:
-                colunas = linha.find_all(['th', 'td'])
-                for coluna in colunas:
-                    texto = coluna.get_text(strip=True)
-                    if texto:
-                        data.append(texto)
-
-        # Se não encontrou dados, tentar métodos alternativos
-        if not data or len(data) < 4:
-            # Método 2: Procurar por qualquer tabela
-            tabelas = soup.find_all('table')
-            for tabela in tabelas:
-                linhas = tabela.find_all('tr')
-                for linha in linhas:
-                    colunas = linha.find_all(['th', 'td'])
-                    for coluna in colunas:
-                        texto = coluna.get_text(strip=True)
-                        if texto:
-                            data.append(texto)
-                if len(data) >= 4:
-                    break
-
-        # Se ainda não encontrou, tentar busca por padrões
-        if not data or len(data) < 4:
-            # Método 3: Buscar por padrões no texto
-            texto_completo = soup.get_text()
-
-            # Procurar anos (2020, 2021, etc.)
-            anos = re.findall(r'\b(20\d{2})\b', texto_completo)
-            # Procurar valores monetários
-            valores = re.findall(r'R\$\s*[\d.,]+', texto_completo)
-
-            if len(anos) >= 2 and len(valores) >= 2:
-                data = []
-                min_len = min(len(anos), len(valores))
-                for i in range(min_len):
-                    data.extend([anos[i], valores[i]])
-
-        # Filtrar dados vazios
-        filtered_data = [item for item in data if item.strip() != '']
-
-        if len(filtered_data) < 4:
-            st.warning(f"⚠️ Dados insuficientes para {acao.upper()} - encontrados {len(filtered_data)} itens")
+
+def exibir_avisos(acao, avisos):
+    for nivel, mensagem in avisos:
+        if nivel == 'debug':
             if st.checkbox(f"Debug {acao.upper()}", key=f"debug_{acao}"):
-                st.write("Dados encontrados:", filtered_data)
-                st.write("Primeiros 500 chars do HTML:", str(soup)[:500])
-            return None
-
-        # Processar e organizar dados
-        try:
-            # Encontrar onde começam os dados (pular cabeçalhos)
-            start_index = 0
-            for i, item in enumerate(filtered_data):
-                if re.match(r'^\d{4}$', item):  # Encontrou um ano
-                    start_index = i
-                    break
-
-            # Se não encontrou ano, assumir que os primeiros 2 são cabeçalhos
-            if start_index == 0 and len(filtered_data) > 2:
-                if not re.match(r'^\d{4}$', filtered_data[0]):
-                    start_index = 2
-
-            # Organizar em pares (ano, valor)
-            pares = []
-            for i in range(start_index, len(filtered_data) - 1, 2):
-                if i + 1 < len(filtered_data):
-                    item1 = filtered_data[i].strip()
-                    item2 = filtered_data[i + 1].strip()
-
-                    # Verificar qual é o ano
-                    if re.match(r'^\d{4}$', item1):
-                        pares.append((item1, item2))
-                    elif re.match(r'^\d{4}$', item2):
-                        pares.append((item2, item1))
-
-            if not pares:
-                st.warning(f"⚠️ Não foi possível organizar dados para {acao.upper()}")
-                return None
-
-            # Criar DataFrame
-            df = pd.DataFrame(pares, columns=['Ano', 'Proventos'])
-
-            # Limpar valores monetários
-            df['Proventos'] = df['Proventos'].astype(str)
-            df['Proventos'] = df['Proventos'].str.replace('R$', '', regex=False)
-            df['Proventos'] = df['Proventos'].str.replace('.', '', regex=False)  # Remove separador de milhares
-            df['Proventos'] = df['Proventos'].str.replace(',', '.', regex=False)  # Troca vírgula por ponto
-            df['Proventos'] = df['Proventos'].str.replace(' ', '', regex=False)  # Remove espaços
-
-            # Converter para numérico
-            df['Proventos'] = pd.to_numeric(df['Proventos'], errors='coerce')
-            df['Ano'] = pd.to_numeric(df['Ano'], errors='coerce')
-
-            # Remover linhas com erro de conversão
-            df = df.dropna()
-
-            if df.empty:
-                st.warning(f"⚠️ Erro na conversão de dados para {acao.upper()}")
-                return None
-
-            # Ajustar escala se necessário
-            if df['Proventos'].mean() > 100:
-                df['Proventos'] = df['Proventos'] / 100
-
-            df['Proventos'] = df['Proventos'].round(2)
-            df['Ano'] = df['Ano'].astype(int)
-
-            # Ordenar por ano
-            df = df.sort_values('Ano').reset_index(drop=True)
-
-            # Criar série completa de anos
-            ano_min = df['Ano'].min()
-            ano_max = df['Ano'].max()
-            anos_completos = list(range(ano_min, ano_max + 1))
-
-            df_final = pd.DataFrame({'Ano': anos_completos})
-            df_final = df_final.merge(df, on='Ano', how='left')
-            df_final['Proventos'] = df_final['Proventos'].fillna(0)
-
-            # Calcular variações
-            df_final['Variação'] = df_final['Proventos'].diff().fillna(0)
-
-            # Tratamento especial ISAE4
-            if acao.upper() == 'ISAE4':
-                if 2025 in df_final['Ano'].values:
-                    dividendo_2025 = df_final[df_final['Ano'] == 2025]['Proventos'].iloc[0]
-                    df_final.loc[df_final['Ano'] == 2024, 'Proventos'] = dividendo_2025
-                    st.info(f"🔄 ISAE4: Usando dividendo de 2025 (R$ {dividendo_2025:.2f}) como base para 2024")
-                    # Recalcular variações
-                    df_final['Variação'] = df_final['Proventos'].diff().fillna(0)
-
-            # Remover 2025 se existir para cálculos
-            df_calc = df_final[df_final['Ano'] != 2025].copy()
-
-            # Calcular médias de variação
-            variacao_avg = df_calc['Variação'].mean()
-            variacao_avg5 = df_calc['Variação'].tail(5).mean()
-            variacao_avg2 = df_calc['Variação'].tail(2).mean()
-
-            # Dividendo base (2024)
-            if 2024 in df_calc['Ano'].values:
-                dividendo_2024 = df_calc[df_calc['Ano'] == 2024]['Proventos'].iloc[0]
-            else:
-                dividendo_2024 = df_calc['Proventos'].iloc[-1]
-
-            # Projeções cumulativas
-            anos_projecao = [2025, 2026, 2027, 2028, 2029]
-
-            # Cenário 1
-            projecao_1 = []
-            valor = dividendo_2024
-            for _ in anos_projecao:
-                valor = round(valor + variacao_avg, 2)
-                projecao_1.append(valor)
-
-            # Cenário 2
-            projecao_2 = []
-            valor = dividendo_2024
-            for _ in anos_projecao:
-                valor = round(valor + variacao_avg5, 2)
-                projecao_2.append(valor)
-
-            # Cenário 3
-            projecao_3 = []
-            valor = dividendo_2024
-            for _ in anos_projecao:
-                valor = round(valor + variacao_avg2, 2)
-                projecao_3.append(valor)
-
-            # Dados históricos (sem 2025)
-            df_historico = df_calc[df_calc['Ano'] <= 2024].copy()
-
-            resultado = {
-                'acao': acao,
-                'df_historico': df_historico,
-                'projecao_cenario1': projecao_1,
-                'projecao_cenario2': projecao_2,
-                'projecao_cenario3': projecao_3,
-                'anos_projecao': anos_projecao,
-                'dividendo_2024': dividendo_2024,
-                'variacao_avg': variacao_avg,
-                'variacao_avg5': variacao_avg5,
-                'variacao_avg2': variacao_avg2,
-                'df_completo': df_calc,
-                'tratamento_especial': acao.upper() == 'ISAE4'
-            }
-
-            return resultado
-
-        except Exception as e:
-            st.error(f"❌ Erro no processamento para {acao.upper()}: {str(e)}")
-            return None
-
-    except Exception as e:
-        st.error(f"❌ Erro geral para {acao.upper()}: {str(e)}")
-        return None
-
-
-def criar_grafico(resultado):
-    acao = resultado['acao']
-    df_historico = resultado['df_historico']
-    projecao_cenario1 = resultado['projecao_cenario1']
-    projecao_cenario2 = resultado['projecao_cenario2']
-    projecao_cenario3 = resultado['projecao_cenario3']
-    anos_projecao = resultado['anos_projecao']
-
-    fig = go.Figure()
-
-    # Dados históricos
-    fig.add_trace(go.Scatter(
-        x=df_historico['Ano'],
-        y=df_historico['Proventos'],
-        mode='lines+markers',
-        name='Dados Históricos',
-        line=dict(color='#2E86C1', width=3),
-        marker=dict(size=8, color='#2E86C1'),
-        hovertemplate='<b>%{x}</b><br>Dividendo: R$ %{y:.2f}<extra></extra>'
-    ))
-
-    ultimo_ano = df_historico['Ano'].iloc[-1]
-    ultimo_valor = df_historico['Proventos'].iloc[-1]
-
-    # Cenário 1
-    anos_c1 = [ultimo_ano] + anos_projecao
-    valores_c1 = [ultimo_valor] + projecao_cenario1
-    fig.add_trace(go.Scatter(
-        x=anos_c1,
-        y=valores_c1,
-        mode='lines+markers',
-        name='Cenário 1: Média Total',
-        line=dict(color='#E74C3C', width=2, dash='dash'),
-        marker=dict(size=6, color='#E74C3C', symbol='square'),
-        hovertemplate='<b>%{x}</b><br>Projeção: R$ %{y:.2f}<extra></extra>'
-    ))
-
-    # Cenário 2
-    anos_c2 = [ultimo_ano] + anos_projecao
-    valores_c2 = [ultimo_valor] + projecao_cenario2
-    fig.add_trace(go.Scatter(
-        x=anos_c2,
-        y=valores_c2,
-        mode='lines+markers',
-        name='Cenário 2: Média 5 Anos',
-        line=dict(color='#28B463', width=2, dash='dash'),
-        marker=dict(size=6, color='#28B463', symbol='triangle-up'),
-        hovertemplate='<b>%{x}</b><br>Projeção: R$ %{y:.2f}<extra></extra>'
-    ))
-
-    # Cenário 3
-    anos_c3 = [ultimo_ano] + anos_projecao
-    valores_c3 = [ultimo_valor] + projecao_cenario3
-    fig.add_trace(go.Scatter(
-        x=anos_c3,
-        y=valores_c3,
-        mode='lines+markers',
-        name='Cenário 3: Média 2 Anos',
-        line=dict(color='#F39C12', width=2, dash='dash'),
-        marker=dict(size=6, color='#F39C12', symbol='diamond'),
-        hovertemplate='<b>%{x}</b><br>Projeção: R$ %{y:.2f}<extra></extra>'
-    ))
-
-    # Linha divisória
-    fig.add_vline(
-        x=ultimo_ano + 0.5,
-        line_dash="dot",
-        line_color="gray",
-        opacity=0.7,
-        annotation_text="Início das Projeções",
-        annotation_position="top"
-    )
-
-    # Título
-    titulo = f'Evolução e Projeção de Dividendos - {acao.upper()}'
-    if resultado.get('tratamento_especial', False):
-        titulo += ' (Base 2024 = Dividendo 2025)'
-
-    fig.update_layout(
-        title={
-            'text': titulo,
-            'x': 0.5,
-            'xanchor': 'center',
-            'font': {'size': 18, 'family': 'Arial Black'}
-        },
-        xaxis_title='Ano',
-        yaxis_title='Dividendos (R$)',
-        font=dict(size=11),
-        hovermode='x unified',
-        legend=dict(
-            orientation="v",
-            yanchor="top",
-            y=1,
-            xanchor="left",
-            x=1.02,
-            bgcolor="rgba(255,255,255,0.9)",
-            bordercolor="rgba(0,0,0,0.2)",
-            borderwidth=1,
-            font=dict(size=10)
-        ),
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        height=500,
-        margin=dict(l=60, r=150, t=80, b=60)
-    )
-
-    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.2)')
-    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.2)')
-
-    return fig
+                for rotulo, valor in mensagem.items():
+                    st.write(rotulo, valor)
+        else:
+            getattr(st, nivel)(mensagem)
 
 
 def main():
@@ -386,8 +309,10 @@ def main():
             help="Exemplo: PETR4, VALE3, ITUB4, ISAE4"
         )
 
+        acoes_validas = []
         if acoes_input:
-            acoes_lista = [acao.strip().lower() for acao in acoes_input.split(',') if acao.strip()]
+            # Sem repetições: a mesma ação duas vezes duplicaria o histórico no painel
+            acoes_lista = list(dict.fromkeys(acao.strip().lower() for acao in acoes_input.split(',') if acao.strip()))
             acoes_validas = []
             acoes_invalidas = []
 
@@ -402,31 +327,250 @@ def main():
 
             if acoes_validas:
                 st.success(f"✅ {len(acoes_validas)} ações válidas: {', '.join([a.upper() for a in acoes_validas])}")
-                if any(acao.upper() == 'ISAE4' for acao in acoes_validas):
-                    st.info("ℹ️ **ISAE4**: Será usado o dividendo de 2025 como base para 2024")
+
+        with st.expander("📅 Projeção"):
+            ano_base = st.number_input(
+                "Ano base:", min_value=1990, max_value=2100, value=CONFIG_PADRAO.ano_base,
+                help="Último ano completo: as projeções partem do dividendo dele"
+            )
+            horizonte = st.slider("Anos projetados:", min_value=1, max_value=15, value=CONFIG_PADRAO.horizonte)
+            anos_parciais = st.text_input(
+                "Anos parciais:", value=", ".join(map(str, CONFIG_PADRAO.anos_parciais)),
+                help="Anos ainda incompletos, separados por vírgula: ficam fora das médias"
+            )
+            regras = st.text_area(
+                "Regras por ação:", value="\n".join(regra.para_texto() for regra in CONFIG_PADRAO.regras),
+                help="Uma por linha. 'ACAO: base=ANO' usa o dividendo de ANO como o do ano base; "
+                     "'ACAO: excluir=ANO,ANO' tira esses anos do cálculo da ação"
+            )
+            try:
+                config = ler_config(ano_base, horizonte, anos_parciais, regras)
+            except ValueError as e:
+                st.error(f"❌ {e}")
+                config = CONFIG_PADRAO
+            st.caption("Mudanças aqui projetam de novo as ações já processadas, sem coletar nada")
+
+        for acao in acoes_validas:
+            regra = config.regra(acao)
+            if regra is not None:
+                st.info(f"ℹ️ **{regra.acao}**: {regra.descricao(config.ano_base)}")
+
+        with st.expander("🌐 Coleta"):
+            max_concorrencia = st.number_input(
+                "Requisições simultâneas:",
+                min_value=1, max_value=MAX_CONCORRENCIA_MAXIMA, value=MAX_CONCORRENCIA_PADRAO,
+                help="Quantas páginas são baixadas ao mesmo tempo"
+            )
+            requisicoes_por_segundo = st.number_input(
+                "Requisições por segundo:",
+                min_value=0.5, max_value=50.0, value=REQUISICOES_POR_SEGUNDO_PADRAO, step=0.5,
+                help="Limite de taxa por servidor (token bucket)"
+            )
+            tentativas = st.number_input(
+                "Novas tentativas:",
+                min_value=0, max_value=10, value=TENTATIVAS_PADRAO,
+                help="Repetições em caso de timeout, erro 5xx ou 429"
+            )
+            backoff = st.number_input(
+                "Backoff inicial (s):",
+                min_value=0.0, max_value=10.0, value=BACKOFF_PADRAO, step=0.25,
+                help="Espera antes da primeira repetição; dobra a cada nova tentativa"
+            )
+            usar_cache = st.checkbox(
+                "💾 Usar cache de páginas em disco", value=True,
+                help="Reaproveita as páginas já baixadas, inclusive entre reinícios do Streamlit"
+            )
+            ttl_horas = st.number_input(
+                "Validade do cache (horas):",
+                min_value=1, max_value=24 * 30, value=TTL_PADRAO // 3600,
+                help="Vale para o cache de páginas e para o histórico salvo"
+            )
+            usar_historico = st.checkbox(
+                "🗄️ Guardar histórico localmente", value=True,
+                help="Salva o histórico já normalizado e só coleta de novo as ações desatualizadas"
+            )
+            forcar_atualizacao = st.checkbox(
+                "🔄 Forçar atualização", value=False,
+                help="Ignora o cache e o histórico salvo e baixa todas as páginas novamente",
+                disabled=not (usar_cache or usar_historico)
+            )
+            processos = st.number_input(
+                "Processos de extração:",
+                min_value=0, max_value=os.cpu_count() or 1, value=0,
+                help="Faz o parse das páginas em vários processos, em lotes; útil para muitas ações "
+                     "já em cache. 0 extrai no processo do app, com memoização por página"
+            )
+            usar_navegador = st.checkbox(
+                "🦊 Usar navegador quando necessário", value=False,
+                help="Abre um Firefox headless só para as ações cuja página não trouxe a tabela "
+                     "por HTTP; o método que funcionou é lembrado para as próximas análises"
+            )
+            if st.button("🧹 Limpar cache de páginas", disabled=not usar_cache):
+                obter_cache_paginas(ttl_horas * 3600).limpar()
+                st.success("✅ Cache de páginas limpo!")
+            if st.button("🧹 Limpar histórico salvo", disabled=not usar_historico):
+                obter_armazem(ttl_horas * 3600).limpar()
+                st.success("✅ Histórico salvo limpo!")
+
+        with st.expander("🎲 Simulação"):
+            usar_simulacao = st.checkbox(
+                "Faixas Monte Carlo (P10/P50/P90)", value=False,
+                help="Reamostra as variações anuais históricas de cada ação e mostra a faixa "
+                     "entre os percentis 10 e 90 nos gráficos e nas tabelas"
+            )
+            simulacoes = st.select_slider(
+                "Caminhos simulados por ação:",
+                options=(1000, 5000, 10000, 20000, 50000), value=SIMULACOES_PADRAO,
+                disabled=not usar_simulacao
+            )
+
+        mostrar_diagnostico = st.checkbox(
+            "🩺 Mostrar diagnóstico", value=False,
+            help="Adiciona uma aba com o tempo de cada etapa por ação, bytes baixados, "
+                 "acertos de cache e método de extração"
+        )
+
+        mostrar_triagem = st.checkbox(
+            "🔎 Triagem do histórico salvo", value=False,
+            help="Ordena e filtra todas as ações já guardadas no histórico local por dividendo, "
+                 "médias de variação, cenários e CAGR, sem coletar nada"
+        )
 
         processar = st.button("🚀 Processar Análise", type="primary", use_container_width=True)
 
+        ano = config.ano_base
+        tratamentos = "\n        ".join(f"**{regra.acao}**: {regra.descricao(ano)}" for regra in config.regras)
         st.markdown("---")
         st.subheader("ℹ️ Sobre os Cenários")
-        st.markdown("""
+        st.markdown(f"""
         **Cenário 1**: Média histórica total (cumulativa)
         **Cenário 2**: Média dos últimos 5 anos (cumulativa)
         **Cenário 3**: Média dos últimos 2 anos (cumulativa)
 
         📈 **Projeção Cumulativa:**
-        - 2025 = Dividendo 2024 + Média
-        - 2026 = Dividendo 2025 + Média
-        - 2027 = Dividendo 2026 + Média
+        - {ano + 1} = Dividendo {ano} + Média
+        - {ano + 2} = Dividendo {ano + 1} + Média
+        - {ano + 3} = Dividendo {ano + 2} + Média
 
         **⚠️ Tratamento Especial:**
-        **ISAE4**: Dividendo 2024 = Dividendo 2025
+        {tratamentos or "Nenhum"}
         """)
 
-    if not processar:
+    if processar:
+        if not acoes_validas:
+            st.error("❌ Nenhuma ação válida foi inserida!")
+            return
+
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+
+        cache = None
+        if usar_cache:
+            cache = obter_cache_paginas(ttl_horas * 3600)
+
+        instrumentacao = Instrumentacao()
+
+        def extrair_memoizado(acao, html, extracao=None):
+            # Memoizado: a mesma página não é extraída de novo
+            return extrair_historico_cache(acao, hash_conteudo(html), html, instrumentacao, extracao)
+
+        def atualizar_progresso(concluidas, total, acao):
+            status_text.text(f"Processando {acao.upper()}... ({concluidas}/{total})")
+            progress_bar.progress(concluidas / total)
+
+        sessao = obter_sessao(max_concorrencia, tentativas, backoff)
+        coletor = None
+        if usar_navegador:
+            coletor = criar_coletor_padrao(sessao, cache, requisicoes_por_segundo, forcar_atualizacao)
+
+        # Figuras e seleções valem só para os resultados anteriores
+        st.session_state.figuras = {}
+        for chave in ('pagina_graficos', 'acoes_graficos'):
+            st.session_state.pop(chave, None)
+
+        area_parcial = st.empty()
+        with area_parcial.container():
+            st.subheader("⏳ Resultados parciais")
+            tabela_parcial = st.empty()
+            graficos_parciais = st.container()
+
+        # Coleta concorrente; cada lote parcial é projetado e exibido assim que fica pronto
+        inicio = time.perf_counter()
+        resultados = []
+        historicos = []
+        avisos_coleta = []
+
+        def guardar_historico(acao, df, avisos):
+            # Os históricos ficam na sessão para projetar de novo quando a configuração mudar
+            if df is not None:
+                historicos.append(df)
+            if avisos:
+                avisos_coleta.append((acao, avisos))
+
+        for calculo, resumo, projecoes, _ in processar_fluxo(
+                acoes_validas,
+                config=config,
+                max_concorrencia=max_concorrencia,
+                requisicoes_por_segundo=requisicoes_por_segundo,
+                cache=cache,
+                forcar_atualizacao=forcar_atualizacao,
+                sessao=sessao,
+                extrair=extrair_historico if processos else extrair_memoizado,
+                ao_progredir=atualizar_progresso,
+                coletor=coletor,
+                armazem=obter_armazem(ttl_horas * 3600) if usar_historico else None,
+                instrumentacao=instrumentacao,
+                processos=processos,
+                ao_coletar=guardar_historico):
+            if resumo is None:
+                continue
+
+            # Parciais sem simulação: as faixas saem na projeção final, uma vez só
+            novos = montar_resultados(calculo, resumo, projecoes, config=config)
+
+            for resultado in novos[:max(0, GRAFICOS_PARCIAIS - len(resultados))]:
+                graficos_parciais.plotly_chart(obter_figura(resultado), use_container_width=True,
+                                               key=f"parcial_{resultado.acao}")
+            resultados.extend(novos)
+            tabela_parcial.dataframe(montar_tabela_resumo(resultados), use_container_width=True)
+
+        area_parcial.empty()
+        tempo_processamento = time.perf_counter() - inicio
+
+        # Painel e mensagens na ordem de entrada
+        ordem = {acao: i for i, acao in enumerate(acoes_validas)}
+        painel = None
+        if historicos:
+            painel = pd.concat(historicos, ignore_index=True)
+            painel = (painel.assign(_posicao=painel['acao'].map(ordem))
+                      .sort_values(['_posicao', 'Ano'], kind='stable', ignore_index=True)
+                      .drop(columns='_posicao'))
+        avisos_coleta.sort(key=lambda item: ordem[item[0]])
+
+        status_text.empty()
+        progress_bar.empty()
+
+        # Históricos sobrevivem aos reruns (troca de aba, edição da lista, debug, nova configuração)
+        st.session_state.painel = painel
+        st.session_state.avisos_coleta = avisos_coleta
+        st.session_state.acoes_processadas = acoes_validas
+        st.session_state.instrumentacao = instrumentacao
+        st.session_state.tempo_processamento = tempo_processamento
+        st.session_state.pop('chave_projecao', None)
+
+    if mostrar_triagem:
+        exibir_triagem(config)
+        return
+
+    if 'painel' in st.session_state:
+        projetar_historicos(config, simulacoes if usar_simulacao else 0)
+
+    if 'resultados' not in st.session_state:
+        tratamentos = "\n            ".join(f"- **{regra.acao}**: {regra.descricao(config.ano_base)}"
+                                           for regra in config.regras)
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
-            st.markdown("""
+            st.markdown(f"""
             ### 🎯 Como usar:
             1. **Digite os códigos das ações** na barra lateral
             2. **Clique em "Processar Análise"**
@@ -434,36 +578,21 @@ def main():
 
             ### 📊 O que você verá:
             - Histórico de dividendos
-            - 3 cenários de projeção **cumulativa** para 2025-2029
+            - 3 cenários de projeção **cumulativa** para {config.anos_projecao[0]}-{config.ano_final}
             - Tabelas com dados detalhados
             - Resumo comparativo
 
             ### ⚠️ Tratamentos Especiais:
-            - **ISAE4**: O dividendo de 2024 será igual ao de 2025
+            {tratamentos or "- Nenhum"}
 
             ### 📈 Metodologia:
             - **Projeção Cumulativa**: Cada ano é baseado no anterior + média
             - **Crescimento Progressivo**: Reflete melhor a evolução temporal
             """)
     else:
-        if not acoes_validas:
-            st.error("❌ Nenhuma ação válida foi inserida!")
-            return
-
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        resultados = []
-        total_acoes = len(acoes_validas)
-
-        for i, acao in enumerate(acoes_validas):
-            resultado = processar_acao(acao, progress_bar, status_text)
-            if resultado:
-                resultados.append(resultado)
-            progress_bar.progress((i + 1) / total_acoes)
-            time.sleep(1)
-
-        status_text.empty()
-        progress_bar.empty()
+        resultados = st.session_state.resultados
+        for acao, avisos in st.session_state.avisos_por_acao:
+            exibir_avisos(acao, avisos)
 
         if not resultados:
             st.error("❌ Nenhuma ação foi processada com sucesso!")
@@ -471,83 +600,77 @@ def main():
 
         st.success(f"✅ {len(resultados)} ações processadas com sucesso!")
 
-        tab1, tab2, tab3 = st.tabs(["📊 Gráficos", "📋 Dados Detalhados", "📈 Resumo Comparativo"])
+        # Os tempos de renderização são medidos de novo a cada rerun
+        instrumentacao = st.session_state.get('instrumentacao') or Instrumentacao()
+        instrumentacao.descartar(ETAPA_GRAFICO, ETAPA_TABELA)
+
+        nomes_abas = ["📊 Gráficos", "📋 Dados Detalhados", "📈 Resumo Comparativo"]
+        if mostrar_diagnostico:
+            nomes_abas.append("🩺 Diagnóstico")
+        abas = st.tabs(nomes_abas)
+        tab1, tab2, tab3 = abas[:3]
 
         with tab1:
             st.header("📊 Gráficos de Projeção Cumulativa")
-            for resultado in resultados:
-                st.subheader(f"📈 {resultado['acao'].upper()}")
-                if resultado.get('tratamento_especial', False):
-                    st.info("🔄 **Tratamento Especial**: Dividendo 2024 baseado no valor de 2025")
-
-                fig = criar_grafico(resultado)
-                st.plotly_chart(fig, use_container_width=True)
-
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    label_2024 = "💰 Dividendo 2024*" if resultado.get('tratamento_especial',
-                                                                      False) else "💰 Dividendo 2024"
-                    st.metric(label_2024, f"R$ {resultado['dividendo_2024']:.2f}")
-                with col2:
-                    st.metric("📊 Cenário 1 (2029)", f"R$ {resultado['projecao_cenario1'][-1]:.2f}")
-                with col3:
-                    st.metric("📊 Cenário 2 (2029)", f"R$ {resultado['projecao_cenario2'][-1]:.2f}")
-                with col4:
-                    st.metric("📊 Cenário 3 (2029)", f"R$ {resultado['projecao_cenario3'][-1]:.2f}")
-                st.markdown("---")
+            modo = st.radio("Visualização:", MODOS_GRAFICOS, horizontal=True, key='modo_graficos')
+
+            # Só as figuras visíveis são construídas e enviadas ao navegador
+            if modo == MODO_PAGINAS:
+                por_pagina = st.selectbox("Gráficos por página:", (5, 10, 20, 50), index=1,
+                                          key='graficos_por_pagina')
+                total_paginas = max(1, math.ceil(len(resultados) / por_pagina))
+                pagina = 1
+                if total_paginas > 1:
+                    pagina = st.number_input(f"Página (de {total_paginas}):", min_value=1,
+                                             max_value=total_paginas, value=1, key='pagina_graficos')
+                visiveis = resultados[(pagina - 1) * por_pagina:pagina * por_pagina]
+            elif modo == MODO_SELECAO:
+                codigos = [resultado.acao.upper() for resultado in resultados]
+                escolhidas = st.multiselect("Ações:", codigos, default=codigos[:3], key='acoes_graficos')
+                visiveis = [resultado for resultado in resultados if resultado.acao.upper() in escolhidas]
+            else:
+                visiveis = []
+                colunas = st.slider("Colunas:", min_value=1, max_value=6, value=COLUNAS_MULTIPLOS_PADRAO,
+                                    key='colunas_multiplos')
+                with instrumentacao.medir(ETAPA_GRAFICO, parte='multiplos', acoes=len(resultados)):
+                    st.plotly_chart(obter_figura_multiplos(resultados, colunas), use_container_width=True)
+
+            for resultado in visiveis:
+                exibir_grafico_acao(resultado, instrumentacao)
 
         with tab2:
             st.header("📋 Dados Detalhados")
             for resultado in resultados:
-                with st.expander(f"📊 Dados de {resultado['acao'].upper()}"):
-                    if resultado.get('tratamento_especial', False):
-                        st.warning("⚠️ **ISAE4**: Os dados de 2024 foram ajustados com base no dividendo de 2025")
+                with st.expander(f"📊 Dados de {resultado.acao.upper()}"), \
+                        instrumentacao.medir(ETAPA_TABELA, resultado.acao):
+                    if resultado.tratamento_especial:
+                        st.warning(f"⚠️ **{resultado.acao.upper()}**: Dados ajustados pela regra da ação "
+                                   f"({resultado.descricao_tratamento})")
 
                     st.subheader("📈 Histórico de Dividendos")
-                    st.dataframe(resultado['df_historico'], use_container_width=True)
+                    st.dataframe(resultado.tabela_historico(), use_container_width=True)
 
-                    st.subheader("🔮 Projeções Cumulativas 2025-2029")
-                    df_projecoes = pd.DataFrame({
-                        'Ano': resultado['anos_projecao'],
-                        'Cenário 1': resultado['projecao_cenario1'],
-                        'Cenário 2': resultado['projecao_cenario2'],
-                        'Cenário 3': resultado['projecao_cenario3']
-                    })
-                    st.dataframe(df_projecoes, use_container_width=True)
+                    st.subheader(f"🔮 Projeções Cumulativas {resultado.anos_projecao[0]}-{resultado.anos_projecao[-1]}")
+                    st.dataframe(resultado.tabela_projecoes(), use_container_width=True)
 
                     st.subheader("📊 Médias de Variação Utilizadas")
                     col1, col2, col3 = st.columns(3)
                     with col1:
-                        st.metric("Média Total", f"{resultado['variacao_avg']:.2f}")
+                        st.metric("Média Total", f"{resultado.variacao_avg:.2f}")
                     with col2:
-                        st.metric("Média 5 Anos", f"{resultado['variacao_avg5']:.2f}")
+                        st.metric("Média 5 Anos", f"{resultado.variacao_avg5:.2f}")
                     with col3:
-                        st.metric("Média 2 Anos", f"{resultado['variacao_avg2']:.2f}")
+                        st.metric("Média 2 Anos", f"{resultado.variacao_avg2:.2f}")
 
-        with tab3:
+        with tab3, instrumentacao.medir(ETAPA_TABELA, parte='comparativo'):
             st.header("📈 Resumo Comparativo")
-            dados_comparativos = []
-            for resultado in resultados:
-                acao_nome = resultado['acao'].upper()
-                if resultado.get('tratamento_especial', False):
-                    acao_nome += "*"
-
-                dados_comparativos.append({
-                    'Ação': acao_nome,
-                    'Dividendo 2024': f"R$ {resultado['dividendo_2024']:.2f}",
-                    'Var. Média Total': f"{resultado['variacao_avg']:.2f}",
-                    'Var. Média 5 Anos': f"{resultado['variacao_avg5']:.2f}",
-                    'Var. Média 2 Anos': f"{resultado['variacao_avg2']:.2f}",
-                    'Cenário 1 (2029)': f"R$ {resultado['projecao_cenario1'][-1]:.2f}",
-                    'Cenário 2 (2029)': f"R$ {resultado['projecao_cenario2'][-1]:.2f}",
-                    'Cenário 3 (2029)': f"R$ {resultado['projecao_cenario3'][-1]:.2f}"
-                })
-
-            df_comparativo = pd.DataFrame(dados_comparativos)
+            df_comparativo = montar_tabela_resumo(resultados)
             st.dataframe(df_comparativo, use_container_width=True)
 
-            if any(resultado.get('tratamento_especial', False) for resultado in resultados):
-                st.caption("* Ações com tratamento especial (ISAE4: Dividendo 2024 = Dividendo 2025)")
+            especiais = [f"{resultado.acao.upper()}: {resultado.descricao_tratamento}"
+                         for resultado in resultados if resultado.tratamento_especial]
+            if especiais:
+                st.caption(f"* Ações com tratamento especial ({'; '.join(especiais)})")
 
             csv = df_comparativo.to_csv(index=False)
             st.download_button(
@@ -557,6 +680,14 @@ def main():
                 mime="text/csv"
             )
 
+            projecao = st.session_state.projecao
+            if projecao is not None:
+                exibir_exportacao(lambda: lotes_projetados(*projecao), 'exportacao_resultados', instrumentacao)
+
+        if mostrar_diagnostico:
+            with abas[3]:
+                exibir_diagnostico(instrumentacao, st.session_state.get('tempo_processamento'))
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from projecao import CENARIOS, CONFIG_PADRAO, projetar_painel
+
+ANOS_CAGR_PADRAO = 5  # janela do crescimento anual composto, terminando no ano base
+TOP_PADRAO = 20
+
+# Colunas numéricas do índice e seus rótulos na interface
+METRICAS = {
+    'dividendo_base': 'Dividendo Base',
+    'variacao_avg': 'Var. Média Total',
+    'variacao_avg5': 'Var. Média 5 Anos',
+    'variacao_avg2': 'Var. Média 2 Anos',
+    'cenario1': 'Cenário 1',
+    'cenario2': 'Cenário 2',
+    'cenario3': 'Cenário 3',
+    'cagr': 'CAGR',
+}
+
+
+def calcular_metricas(painel, config=None, anos_cagr=ANOS_CAGR_PADRAO):
+    """Métricas numéricas de todas as ações do painel (acao, Ano, Proventos), uma linha por ação.
+
+    O CAGR vai do primeiro ano com provento positivo dentro da janela de
+    ``anos_cagr`` anos até o último ano do histórico (o ano base, quando
+    existe); fica NaN se não houver crescimento mensurável. ``config`` é o
+    ConfigProjecao da projeção (CONFIG_PADRAO se omitido).
+    """
+    calculo, resumo, projecoes = projetar_painel(painel, config)
+    finais = projecoes[projecoes['Ano'] == projecoes['Ano'].max()].set_index('acao')
+
+    ultimo_ano = calculo.groupby('acao', sort=False)['Ano'].max().reindex(resumo.index)
+    janela = calculo[calculo['Ano'] >= calculo['acao'].map(ultimo_ano) - anos_cagr]
+    inicio = janela[janela['Proventos'] > 0].groupby('acao', sort=False)[['Ano', 'Proventos']].first()
+    inicio = inicio.reindex(resumo.index)
+    periodos = (ultimo_ano - inicio['Ano']).to_numpy(dtype=float)
+    razao = resumo['dividendo_base'].to_numpy(dtype=float) / inicio['Proventos'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cagr = np.where((periodos > 0) & (razao > 0), razao ** (1 / periodos) - 1, np.nan)
+
+    metricas = pd.DataFrame({
+        'dividendo_base': resumo['dividendo_base'].to_numpy(dtype=float),
+        'variacao_avg': resumo['variacao_avg'].to_numpy(dtype=float),
+        'variacao_avg5': resumo['variacao_avg5'].to_numpy(dtype=float),
+        'variacao_avg2': resumo['variacao_avg2'].to_numpy(dtype=float),
+        'cenario1': finais[CENARIOS[0]].reindex(resumo.index).to_numpy(dtype=float),
+        'cenario2': finais[CENARIOS[1]].reindex(resumo.index).to_numpy(dtype=float),
+        'cenario3': finais[CENARIOS[2]].reindex(resumo.index).to_numpy(dtype=float),
+        'cagr': cagr,
+        'anos_historico': calculo.groupby('acao', sort=False).size().reindex(resumo.index, fill_value=0)
+                                 .to_numpy(),
+        'tratamento_especial': resumo['tratamento_especial'].to_numpy(dtype=bool),
+    }, index=pd.Index(resumo.index, name='acao'))
+    return metricas
+
+
+def _metricas_vazias():
+    colunas = [*METRICAS, 'anos_historico', 'tratamento_especial']
+    return pd.DataFrame(columns=colunas, index=pd.Index([], name='acao')).astype(
+        {coluna: float for coluna in METRICAS}
+    )
+
+
+class IndiceTriagem:
+    """Índice de triagem sobre as métricas pré-calculadas de um universo de ações.
+
+    As métricas ficam em arrays NumPy e a ordem de cada uma é calculada uma
+    única vez, na primeira consulta que a usa: ordenações e top-N depois
+    disso são só fatias, e filtros são máscaras vetorizadas. NaN vai sempre
+    para o fim, em qualquer sentido.
+    """
+
+    def __init__(self, metricas, config=None):
+        self.metricas = metricas
+        self.config = CONFIG_PADRAO if config is None else config
+        self._valores = {coluna: metricas[coluna].to_numpy(dtype=float) for coluna in METRICAS}
+        self._ordens = {}
+
+    @classmethod
+    def do_armazem(cls, armazem, config=None, anos_cagr=ANOS_CAGR_PADRAO):
+        """Índice de todas as ações salvas no armazém de histórico, projetadas com ``config``"""
+        painel = armazem.carregar()
+        if painel.empty:
+            return cls(_metricas_vazias(), config)
+        return cls(calcular_metricas(painel, config, anos_cagr), config)
+
+    def __len__(self):
+        return len(self.metricas)
+
+    def _ordem(self, metrica, decrescente):
+        chave = (metrica, decrescente)
+        if chave not in self._ordens:
+            valores = self._valores[metrica]
+            self._ordens[chave] = np.argsort(-valores if decrescente else valores, kind='stable')
+        return self._ordens[chave]
+
+    def mascara(self, filtros=None):
+        """Filtros ``{metrica: (minimo, maximo)}``, com None para o limite aberto"""
+        mascara = np.ones(len(self), dtype=bool)
+        for metrica, (minimo, maximo) in (filtros or {}).items():
+            valores = self._valores[metrica]
+            if minimo is not None:
+                mascara &= valores >= minimo
+            if maximo is not None:
+                mascara &= valores <= maximo
+        return mascara
+
+    def consultar(self, metrica='cagr', decrescente=True, n=None, filtros=None):
+        """Ações que passam nos filtros, ordenadas por ``metrica``; com ``n``, só as ``n`` primeiras"""
+        if metrica not in METRICAS:
+            raise ValueError(f"Métrica desconhecida: {metrica}")
+        ordem = self._ordem(metrica, decrescente)
+        if filtros:
+            ordem = ordem[self.mascara(filtros)[ordem]]
+        if n is not None:
+            ordem = ordem[:n]
+        return self.metricas.iloc[ordem]
+
+    def top(self, metrica='cagr', n=TOP_PADRAO, filtros=None):
+        return self.consultar(metrica, True, n, filtros)
+
+    def tabela(self, selecao):
+        """Resultado de uma consulta com os rótulos da interface, ainda numérico"""
+        rotulos = {coluna: f'{rotulo} ({self.config.ano_final})' if coluna.startswith('cenario') else rotulo
+                   for coluna, rotulo in METRICAS.items()}
+        rotulos['dividendo_base'] = f'Dividendo {self.config.ano_base}'
+        tabela = selecao.rename(columns=rotulos).rename(columns={
+            'anos_historico': 'Anos de Histórico', 'tratamento_especial': 'Tratamento Especial'
+        })
+        tabela.index = tabela.index.str.upper()
+        return tabela.rename_axis('Ação').reset_index()
+